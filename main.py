@@ -69,9 +69,13 @@ def main():
     
     # Send startup notification
     try:
-        from utils.notifier import Notifier
-        notifier = Notifier()
+        from utils.notifier import get_notifier
+        notifier = get_notifier()
         notifier.system_startup(__version__)
+        # Let the send finish before forking: children inherit the
+        # executor's lock and pooled socket in whatever state they are in.
+        if not notifier.flush(timeout=5):
+            logger.warning("Startup notification still pending after 5s")
     except Exception as e:
         logger.warning(f"Startup notification failed: {e}")
 
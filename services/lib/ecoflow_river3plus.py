@@ -10,7 +10,7 @@ Responsibilities:
 
 import time
 import logging
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Union
 
 logger = logging.getLogger("ecoflow_river3plus")
 
@@ -33,7 +33,8 @@ class EcoFlowDevice:
         """
         try:
             # 1. Parse into a list of message objects (dictionaries)
-            messages = self._parse_proto_structure(payload)
+            # memoryview so nested sub-message slices are views, not copies
+            messages = self._parse_proto_structure(memoryview(payload))
 
             raw_socs = []
             valid_temps = []
@@ -162,30 +163,44 @@ class EcoFlowDevice:
 
     # --- Logic: Structured Protobuf Parser ---
 
-    def _parse_proto_structure(self, payload: bytes) -> List[Dict[int, Any]]:
+    # Fields update_from_protobuf reads: 6 SOC, 16 temp, 27 grid, 28 power.
+    # Everything else is walked over without being stored.
+    _FIELDS_OF_INTEREST = frozenset((6, 16, 27, 28))
+
+    @staticmethod
+    def _parse_proto_structure(payload: Union[bytes, memoryview]) -> List[Dict[int, Any]]:
         messages = []
         current_msg = {}
+        wanted = EcoFlowDevice._FIELDS_OF_INTEREST
+        read_varint = EcoFlowDevice._read_varint
+        n = len(payload)
 
         i = 0
-        while i < len(payload):
+        while i < n:
             try:
-                tag, i = self._read_varint(payload, i)
+                # Single-byte tags and values are read inline
+                tag = payload[i]
+                if tag < 0x80: i += 1
+                else: tag, i = read_varint(payload, i)
                 field = tag >> 3
                 wtype = tag & 0x7
 
                 if wtype == 0: # Varint
-                    val, i = self._read_varint(payload, i)
-                    current_msg[field] = val
+                    if i < n and payload[i] < 0x80:
+                        val = payload[i]
+                        i += 1
+                    else:
+                        val, i = read_varint(payload, i)
+                    if field in wanted:
+                        current_msg[field] = val
                 elif wtype == 2: # Length Delimited
-                    ln, i = self._read_varint(payload, i)
+                    ln, i = read_varint(payload, i)
                     if ln > 0:
                         sub_payload = payload[i:i+ln]
                         # Try to parse as sub-message
-                        sub_msgs = self._parse_proto_structure(sub_payload)
+                        sub_msgs = EcoFlowDevice._parse_proto_structure(sub_payload)
                         if sub_msgs:
                             messages.extend(sub_msgs)
-                        else:
-                            pass
                     i += ln
                 elif wtype == 1: i += 8
                 elif wtype == 5: i += 4
@@ -196,7 +211,8 @@ class EcoFlowDevice:
             messages.append(current_msg)
         return messages
 
-    def _read_varint(self, buf: bytes, i: int) -> Tuple[int, int]:
+    @staticmethod
+    def _read_varint(buf: bytes, i: int) -> Tuple[int, int]:
         shift = 0
         val = 0
         while True:
@@ -18,12 +18,15 @@ import paho.mqtt.client as mqtt
 # --- Import Utils ---
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import env_loader
-from utils.notifier import Notifier
+from utils.notifier import get_notifier
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
 logger = logging.getLogger("policy_engine")
 
+# Shared decoder for config and per-message state payloads
+_JSON_DECODER = json.JSONDecoder()
+
 
 class PolicyEngine:
     def __init__(self):
@@ -41,7 +44,7 @@ class PolicyEngine:
         self.device_to_agents = {}
         
         # Initialize notifier
-        self.notifier = Notifier()
+        self.notifier = get_notifier()
         
         # Track SOC levels for 2% increment alerts
         self.last_soc_alert = {}  # {device: last_alerted_soc}
@@ -54,7 +57,7 @@ class PolicyEngine:
             # JSON Mapping: {"Meterkast": ["agent1"], "Study": ["agent2"]}
             raw_agents = os.environ.get("DEVICE_TO_AGENTS_JSON", "{}")
             if raw_agents.strip():  # Only parse if not empty
-                self.device_to_agents = json.loads(raw_agents)
+                self.device_to_agents = _JSON_DECODER.decode(raw_agents)
             else:
                 logger.warning("DEVICE_TO_AGENTS_JSON is empty - no agents will be managed")
 
@@ -133,7 +136,7 @@ class PolicyEngine:
 
     def on_message(self, client, userdata, msg):
         try:
-            payload = json.loads(msg.payload.decode())
+            payload = _JSON_DECODER.decode(msg.payload.decode())
             device = payload.get("device")
             soc = payload.get("soc")
             grid_connected = payload.get("grid_connected")
@@ -253,6 +256,8 @@ def main():
         engine.run()
     except KeyboardInterrupt:
         logger.info("Stopping Policy Engine...")
+        # Let queued alerts (e.g. shutdown notices) go out before exiting
+        get_notifier().flush(timeout=5)
     except Exception as e:
         logger.critical(f"Unexpected error: {e}")
 
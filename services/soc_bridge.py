@@ -58,7 +58,9 @@ def on_message(client, userdata, msg):
         if device.update_from_protobuf(msg.payload):
             # Apply filtering to device state
             device_json = device.to_json()
-            current_time = time.time()
+            # One clock read per message, shared by both filters. Monotonic so
+            # NTP steps can't fake (or hide) the filters' offline-gap reset.
+            current_time = time.monotonic()
             
             # Filter SOC reading
             raw_soc = device_json.get("soc")
@@ -1,5 +1,11 @@
+import os
+import sys
 import time
 import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from utils.soc_filter import SOCFilter
 
 class TestSOCFilterReproduction(unittest.TestCase):
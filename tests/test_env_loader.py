@@ -7,6 +7,8 @@ Tests the environment variable loader's ability to:
 - Parse multi-line values (enclosed in quotes)
 - Handle empty values
 - Handle malformed input
+- Keep a trailing backslash inside quotes
+- Let the file override the environment on request
 """
 import os
 import sys
@@ -17,14 +19,23 @@ import unittest
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.env_loader import load_env
+
 
 class TestEnvLoader(unittest.TestCase):
     """Test cases for env_loader.py"""
 
+    _TRACKED = frozenset({'MQTT_HOST', 'MQTT_PORT', 'DEVICE_TO_AGENTS_JSON', 'POLICY_SOC_MIN'})
+
     def setUp(self):
-        """Clear environment variables before each test"""
-        for key in ['MQTT_HOST', 'MQTT_PORT', 'DEVICE_TO_AGENTS_JSON', 'POLICY_SOC_MIN']:
+        """Snapshot and clear tracked environment variables before each test"""
+        self._saved_env = {k: os.environ.pop(k) for k in self._TRACKED if k in os.environ}
+
+    def tearDown(self):
+        """Restore tracked environment variables"""
+        for key in self._TRACKED:
             os.environ.pop(key, None)
+        os.environ.update(self._saved_env)
 
     def test_multiline_json(self):
         """Test parsing of multi-line JSON values"""
@@ -47,7 +58,7 @@ POLICY_SOC_MIN=5
         
         try:
             # Load using the env_loader logic
-            self._load_env_file(temp_env_path)
+            self._load_env_file(temp_env_path, required_keys=('MQTT_HOST', 'MQTT_PORT', 'POLICY_SOC_MIN', 'DEVICE_TO_AGENTS_JSON'))
             
             # Verify basic values
             self.assertEqual(os.environ.get('MQTT_HOST'), 'mosquitto.hs.mfis.net')
@@ -78,7 +89,7 @@ DEVICE_TO_AGENTS_JSON='{"Study":["mac-mini","nas-thecus"],"Meterkast":["n1","n2"
             temp_env_path = f.name
         
         try:
-            self._load_env_file(temp_env_path)
+            self._load_env_file(temp_env_path, required_keys=('DEVICE_TO_AGENTS_JSON',))
             
             json_str = os.environ.get('DEVICE_TO_AGENTS_JSON', '{}')
             parsed = json.loads(json_str)
@@ -89,6 +100,26 @@ DEVICE_TO_AGENTS_JSON='{"Study":["mac-mini","nas-thecus"],"Meterkast":["n1","n2"
         finally:
             os.unlink(temp_env_path)
 
+    def test_quoted_value_ending_in_backslash(self):
+        """Test that a trailing backslash does not swallow the closing quote"""
+        test_env_content = r"""
+MQTT_HOST="C:\dir\"
+POLICY_SOC_MIN='C:\dir\' # comment
+"""
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.env', delete=False) as f:
+            f.write(test_env_content)
+            temp_env_path = f.name
+        
+        try:
+            self._load_env_file(temp_env_path)
+            
+            self.assertEqual(os.environ.get('MQTT_HOST'), 'C:\\dir\\')
+            self.assertEqual(os.environ.get('POLICY_SOC_MIN'), 'C:\\dir\\')
+            
+        finally:
+            os.unlink(temp_env_path)
+
     def test_empty_value(self):
         """Test handling of empty values"""
         test_env_content = """
@@ -101,7 +132,7 @@ DEVICE_TO_AGENTS_JSON=
             temp_env_path = f.name
         
         try:
-            self._load_env_file(temp_env_path)
+            self._load_env_file(temp_env_path, required_keys=('DEVICE_TO_AGENTS_JSON',))
             
             json_str = os.environ.get('DEVICE_TO_AGENTS_JSON', '{}')
             self.assertEqual(json_str.strip(), '')
@@ -109,44 +140,71 @@ DEVICE_TO_AGENTS_JSON=
         finally:
             os.unlink(temp_env_path)
 
-    def _load_env_file(self, env_path):
-        """Helper method to load env file using the same logic as env_loader.py"""
-        with open(env_path, 'r') as f:
-            lines = f.readlines()
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                if not line or line.startswith('#'):
-                    i += 1
-                    continue
-
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip()
-
-                    # Check if value starts with a quote but doesn't end with one
-                    if (value.startswith("'") and not value.endswith("'")) or \
-                       (value.startswith('"') and not value.endswith('"')):
-                        opening_quote = value[0]
-                        i += 1
-                        while i < len(lines):
-                            next_line = lines[i].rstrip('\n\r')
-                            value += '\n' + next_line
-                            if next_line.rstrip().endswith(opening_quote):
-                                break
-                            i += 1
-
-                    # Remove surrounding quotes
-                    if (value.startswith('"') and value.endswith('"')) or \
-                            (value.startswith("'") and value.endswith("'")):
-                        value = value[1:-1]
-
-                    if key not in os.environ:
-                        os.environ[key] = value
-                
-                i += 1
+    def test_skips_file_when_required_keys_present(self):
+        """Test that the file is not parsed when all required keys are already set"""
+        test_env_content = """
+MQTT_HOST=from-file.local
+POLICY_SOC_MIN=5
+"""
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.env', delete=False) as f:
+            f.write(test_env_content)
+            temp_env_path = f.name
+        
+        try:
+            os.environ['MQTT_HOST'] = 'from-environment.local'
+            self._load_env_file(temp_env_path, required_keys=('MQTT_HOST',))
+            
+            self.assertEqual(os.environ.get('MQTT_HOST'), 'from-environment.local')
+            self.assertNotIn('POLICY_SOC_MIN', os.environ)
+            
+        finally:
+            os.unlink(temp_env_path)
+
+    def test_override_replaces_environment(self):
+        """Test that override=True lets the file win over existing variables"""
+        test_env_content = """
+MQTT_HOST=from-file.local
+"""
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.env', delete=False) as f:
+            f.write(test_env_content)
+            temp_env_path = f.name
+        
+        try:
+            os.environ['MQTT_HOST'] = 'from-environment.local'
+            self._load_env_file(temp_env_path, override=True)
+            
+            self.assertEqual(os.environ.get('MQTT_HOST'), 'from-file.local')
+            
+        finally:
+            os.unlink(temp_env_path)
+
+    def test_override_after_cached_load(self):
+        """Test that override=True re-reads a file an earlier load already parsed"""
+        test_env_content = """
+MQTT_HOST=from-file.local
+"""
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.env', delete=False) as f:
+            f.write(test_env_content)
+            temp_env_path = f.name
+        
+        try:
+            os.environ['MQTT_HOST'] = 'from-environment.local'
+            # First load (like the import-time autoload) keeps the environment value
+            self._load_env_file(temp_env_path)
+            self.assertEqual(os.environ.get('MQTT_HOST'), 'from-environment.local')
+            
+            self._load_env_file(temp_env_path, required_keys=('MQTT_HOST',), override=True)
+            self.assertEqual(os.environ.get('MQTT_HOST'), 'from-file.local')
+            
+        finally:
+            os.unlink(temp_env_path)
+
+    def _load_env_file(self, env_path, required_keys=(), override=False):
+        """Helper method to load a specific env file through env_loader"""
+        load_env(required_keys, env_path=env_path, override=override)
 
 
 if __name__ == '__main__':
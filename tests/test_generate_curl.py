@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Unit tests for tools/generate_curl.py
+
+Tests the credential loading of the curl generator:
+- The project .env wins over stale exported ECOFLOW_* variables
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestGenerateCurl(unittest.TestCase):
+    """Test cases for generate_curl.py"""
+
+    def test_env_file_overrides_shell(self):
+        """An exported ECOFLOW_ACCESS_KEY must not beat the project .env"""
+        with tempfile.TemporaryDirectory() as root:
+            # Minimal project copy so the tool finds this .env, not the real one
+            shutil.copytree(os.path.join(PROJECT_ROOT, "utils"), os.path.join(root, "utils"),
+                            ignore=shutil.ignore_patterns("__pycache__"))
+            os.mkdir(os.path.join(root, "tools"))
+            shutil.copy(os.path.join(PROJECT_ROOT, "tools", "generate_curl.py"), os.path.join(root, "tools"))
+            with open(os.path.join(root, ".env"), "w") as f:
+                f.write("ECOFLOW_ACCESS_KEY=from_env_file\nECOFLOW_SECRET_KEY=secret\n")
+
+            env = dict(os.environ, ECOFLOW_ACCESS_KEY="stale_shell", ECOFLOW_SECRET_KEY="stale_secret")
+            env.pop("ECOFLOW_AUTOLOAD_ENV", None)
+            result = subprocess.run(
+                [sys.executable, "-c", "import generate_curl as g; print(g.ACCESS_KEY, g.SECRET_KEY)"],
+                cwd=os.path.join(root, "tools"), env=env, capture_output=True, text=True, check=True,
+            )
+
+        self.assertEqual(result.stdout.split(), ["from_env_file", "secret"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit tests for Notifier
+
+Tests the notifier module's dispatch logic without touching the network:
+- send() hands each enabled service to a background worker
+- Failures are contained in the returned futures
+- Disabled services are skipped
+- A full backlog drops new messages; flush() waits for pending sends
+- Repeats of the same SOC warning are coalesced; new SOC steps always send
+- Telegram requests carry a well-formed JSON body
+"""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.notifier import Notifier, get_notifier
+
+NOTIFIER_ENV = {
+    "PUSHOVER_ENABLED": "true",
+    "PUSHOVER_USER_KEY": "user123",
+    "PUSHOVER_API_TOKEN": "token456",
+    "TELEGRAM_ENABLED": "true",
+    "TELEGRAM_BOT_TOKEN": "bot789",
+    "TELEGRAM_CHAT_ID": "42",
+}
+
+
+class TestNotifier(unittest.TestCase):
+    """Test cases for Notifier"""
+
+    def setUp(self):
+        """Create a notifier with both services enabled and stubbed senders"""
+        with mock.patch.dict(os.environ, NOTIFIER_ENV):
+            self.notifier = Notifier()
+        self.notifier._send_pushover = mock.Mock()
+        self.notifier._send_telegram = mock.Mock()
+
+    def tearDown(self):
+        self.notifier.close()
+
+    def test_send_dispatches_all_services(self):
+        """Both services receive the message from background workers"""
+        futures = self.notifier.send("<b>Hello</b>", priority=1, title="Test")
+
+        self.assertEqual(len(futures), 2)
+        for future in futures:
+            future.result(timeout=5)
+
+        self.notifier._send_pushover.assert_called_once_with("<b>Hello</b>", 1, "Test")
+        self.notifier._send_telegram.assert_called_once_with("<b>Hello</b>")
+
+    def test_failure_is_contained(self):
+        """A failing service does not raise into the caller"""
+        self.notifier._send_pushover.side_effect = RuntimeError("boom")
+
+        with self.assertLogs("notifier", level="ERROR"):
+            self.notifier.send("Hello")
+            self.notifier.close(wait=True)  # results are logged by the workers
+
+        self.notifier._send_telegram.assert_called_once_with("Hello")
+
+    def test_no_services_enabled(self):
+        """send() is a no-op when every service is disabled"""
+        self.notifier.pushover_enabled = False
+        self.notifier.telegram_enabled = False
+
+        self.assertEqual(self.notifier.send("Hello"), [])
+        self.notifier._send_pushover.assert_not_called()
+
+    def test_backlog_full_drops_message(self):
+        """Nothing is submitted once the pending limit is reached"""
+        self.notifier._MAX_PENDING = 0
+
+        with self.assertLogs("notifier", level="WARNING"):
+            self.assertEqual(self.notifier.send("Hello"), [])
+        self.notifier._send_pushover.assert_not_called()
+
+    def test_flush_waits_for_pending(self):
+        """flush() returns once every submitted send has completed"""
+        futures = self.notifier.send("Hello")
+
+        self.assertTrue(self.notifier.flush(timeout=5))
+        self.assertTrue(all(future.done() for future in futures))
+
+    def test_soc_warning_repeats_suppressed(self):
+        """A repeat of the same reading is dropped; every new SOC step still sends"""
+        self.notifier.send = mock.Mock()
+
+        self.notifier.soc_warning("Study", 18, 10)
+        self.notifier.soc_warning("Study", 18, 10)
+        self.notifier.soc_warning("Study", 16, 10)
+        self.notifier.soc_warning("Study", 14, 10)
+
+        self.assertEqual(self.notifier.send.call_count, 3)
+        self.assertIn("14%", self.notifier.send.call_args.args[0])
+
+    def test_retry_policy(self):
+        """Only undelivered posts (429) are retried; 5xx and read errors are not"""
+        retry = Notifier._RETRY
+
+        self.assertTrue(retry.is_retry("POST", 429))
+        self.assertFalse(retry.is_retry("POST", 503))
+        self.assertEqual(retry.read, 0)
+
+    def test_telegram_payload(self):
+        """The pre-built Telegram body is valid JSON with the message escaped"""
+        with mock.patch.dict(os.environ, NOTIFIER_ENV):
+            notifier = Notifier()
+        self.addCleanup(notifier.close)
+        notifier._session.post = mock.Mock()
+
+        notifier._send_telegram('Say "hi" \u00e9')
+
+        url = notifier._session.post.call_args.args[0]
+        body = notifier._session.post.call_args.kwargs["data"]
+        self.assertEqual(url, "https://api.telegram.org/botbot789/sendMessage")
+        self.assertEqual(
+            json.loads(body),
+            {"chat_id": "42", "parse_mode": "HTML", "text": 'Say "hi" \u00e9'},
+        )
+
+
+class TestGetNotifier(unittest.TestCase):
+    """Test cases for the shared notifier accessor"""
+
+    def test_returns_shared_instance(self):
+        """Repeated calls in one process return the same Notifier"""
+        self.assertIs(get_notifier(), get_notifier())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,15 +16,57 @@ import unittest
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Shared decoder, mirrors services/policy_engine.py
+_JSON_DECODER = json.JSONDecoder()
+
+
+class MockPolicyEngine:
+    """Mirrors PolicyEngine.__init__ without the MQTT client and notifier"""
+
+    def __init__(self):
+        # This mirrors the actual PolicyEngine.__init__
+        self.mqtt_host = os.environ.get("MQTT_HOST", "mosquitto.hs.mfis.net")
+        self.mqtt_port = int(os.environ.get("MQTT_PORT", 1883))
+        self.mqtt_base = os.environ.get("ECOFLOW_BASE", "bridge-ecoflow")
+
+        # Initialize critical attributes with defaults (ensures they always exist)
+        self.policy_soc_min = 10
+        self.policy_debounce_sec = 180
+        self.policy_cooldown_sec = 300
+        self.max_data_gap_sec = 60
+        self.agent_shutdown_delay = 60
+        self.device_to_agents = {}
+
+        try:
+            self.policy_soc_min = int(os.environ.get("POLICY_SOC_MIN", "10"))
+            self.policy_debounce_sec = int(os.environ.get("POLICY_DEBOUNCE_SEC", "180"))
+            self.policy_cooldown_sec = int(os.environ.get("POLICY_COOLDOWN_SEC", "300"))
+
+            raw_agents = os.environ.get("DEVICE_TO_AGENTS_JSON", "{}")
+            if raw_agents.strip():
+                self.device_to_agents = _JSON_DECODER.decode(raw_agents)
+
+        except (KeyError, ValueError, json.JSONDecodeError):
+            pass  # Defaults already set
+
 
 class TestPolicyEngineInitialization(unittest.TestCase):
     """Test cases for PolicyEngine initialization and configuration"""
 
+    _TRACKED = frozenset({
+        'MQTT_HOST', 'MQTT_PORT', 'ECOFLOW_BASE', 'DEVICE_TO_AGENTS_JSON',
+        'POLICY_SOC_MIN', 'POLICY_DEBOUNCE_SEC', 'POLICY_COOLDOWN_SEC',
+    })
+
     def setUp(self):
-        """Clear environment variables before each test"""
-        for key in list(os.environ.keys()):
-            if key.startswith('DEVICE_') or key.startswith('POLICY_') or key.startswith('MQTT_'):
-                del os.environ[key]
+        """Snapshot and clear tracked environment variables before each test"""
+        self._saved_env = {k: os.environ.pop(k) for k in self._TRACKED if k in os.environ}
+
+    def tearDown(self):
+        """Restore tracked environment variables"""
+        for key in self._TRACKED:
+            os.environ.pop(key, None)
+        os.environ.update(self._saved_env)
 
     def test_empty_json_config(self):
         """Test that PolicyEngine initializes correctly with empty DEVICE_TO_AGENTS_JSON"""
@@ -109,33 +151,6 @@ class TestPolicyEngineInitialization(unittest.TestCase):
 
     def _create_mock_engine(self):
         """Create a mock PolicyEngine with the same initialization logic"""
-        class MockPolicyEngine:
-            def __init__(self):
-                # This mirrors the actual PolicyEngine.__init__
-                self.mqtt_host = os.environ.get("MQTT_HOST", "mosquitto.hs.mfis.net")
-                self.mqtt_port = int(os.environ.get("MQTT_PORT", 1883))
-                self.mqtt_base = os.environ.get("ECOFLOW_BASE", "bridge-ecoflow")
-
-                # Initialize critical attributes with defaults (ensures they always exist)
-                self.policy_soc_min = 10
-                self.policy_debounce_sec = 180
-                self.policy_cooldown_sec = 300
-                self.max_data_gap_sec = 60
-                self.agent_shutdown_delay = 60
-                self.device_to_agents = {}
-
-                try:
-                    self.policy_soc_min = int(os.environ.get("POLICY_SOC_MIN", "10"))
-                    self.policy_debounce_sec = int(os.environ.get("POLICY_DEBOUNCE_SEC", "180"))
-                    self.policy_cooldown_sec = int(os.environ.get("POLICY_COOLDOWN_SEC", "300"))
-
-                    raw_agents = os.environ.get("DEVICE_TO_AGENTS_JSON", "{}")
-                    if raw_agents.strip():
-                        self.device_to_agents = json.loads(raw_agents)
-
-                except (KeyError, ValueError, json.JSONDecodeError):
-                    pass  # Defaults already set
-
         return MockPolicyEngine()
 
 
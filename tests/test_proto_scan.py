@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Unit tests for proto_scan
+
+Tests the shared schema-less protobuf helpers used by the tools/ scripts.
+"""
+import os
+import sys
+import queue
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.proto_scan import drain_batch, looks_like_proto, read_varint, scan_payload_flat
+
+
+class TestProtoScan(unittest.TestCase):
+    """Test cases for the proto_scan helpers"""
+
+    def test_read_varint(self):
+        """Single and multi-byte varints decode with the next offset"""
+        self.assertEqual(read_varint(bytes((0x5A,)), 0), (90, 1))
+        self.assertEqual(read_varint(bytes((0xC4, 0x13)), 0), (2500, 2))
+
+    def test_read_varint_truncated(self):
+        """A varint cut off by the end bound reports EOF"""
+        self.assertEqual(read_varint(bytes((0xC4, 0x13)), 0, 1), (None, -1))
+        self.assertEqual(read_varint(b"", 0), (None, -1))
+
+    def test_looks_like_proto(self):
+        """Only a valid wire type with a non-zero field counts as nested"""
+        self.assertTrue(looks_like_proto(bytes((0x08, 0x01)), 0, 2))
+        self.assertFalse(looks_like_proto(bytes((0x00, 0x01)), 0, 2))  # field 0
+        self.assertFalse(looks_like_proto(bytes((0x0B, 0x01)), 0, 2))  # wire type 3
+
+    def test_scan_payload_flat_nested(self):
+        """Varints are reported with their depth in wire order"""
+        # field 1 = 1, field 2 = { field 6 = 90, field 3 = { field 28 = 100 } }, field 4 = 7
+        payload = bytes((0x08, 0x01, 0x12, 0x07, 0x30, 0x5A, 0x1A, 0x03, 0xE0, 0x01, 0x64, 0x20, 0x07))
+        self.assertEqual(
+            scan_payload_flat(payload),
+            [(0, 1, 1), (1, 6, 90), (2, 28, 100), (0, 4, 7)],
+        )
+
+    def test_scan_payload_flat_truncated(self):
+        """A truncated tail stops the walk without raising"""
+        payload = bytes((0x08, 0x01, 0x10, 0xC4))
+        self.assertEqual(scan_payload_flat(payload), [(0, 1, 1)])
+
+
+    def test_drain_batch(self):
+        """Queued messages come out in order, at most batch_size at a time"""
+        inbox = queue.SimpleQueue()
+        for i in range(5):
+            inbox.put(("topic", bytes((i,))))
+
+        self.assertEqual([p[0] for _, p in drain_batch(inbox, batch_size=3)], [0, 1, 2])
+        self.assertEqual([p[0] for _, p in drain_batch(inbox, batch_size=3)], [3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
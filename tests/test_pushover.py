@@ -1,31 +1,45 @@
 #!/usr/bin/env python3
 """
 Test script to verify Pushover notifications work
+
+Sends a real notification, so it only runs when PUSHOVER_ENABLED=true
+(in the environment or .env file).
 """
 import os
 import sys
+import unittest
 
-# Add parent directory to path
+# Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Load environment
 from utils import env_loader
-from utils.notifier import Notifier
-
-def main():
-    print("Testing Pushover notifications...")
-    print(f"PUSHOVER_ENABLED: {os.getenv('PUSHOVER_ENABLED')}")
-    print(f"PUSHOVER_USER_KEY: {os.getenv('PUSHOVER_USER_KEY', '')[:8]}***")
-    print(f"PUSHOVER_API_TOKEN: {os.getenv('PUSHOVER_API_TOKEN', '')[:8]}***")
-    
-    notifier = Notifier()
-    
-    print("\nSending test notification...")
-    notifier.send("This is a test notification from EcoFlow Power Management", 
-                  priority=0, 
-                  title="Test Notification")
-    
-    print("Done! Check your Pushover app.")
+
+PUSHOVER_ENABLED = os.getenv("PUSHOVER_ENABLED", "false").lower() == "true"
+
+
+@unittest.skipUnless(PUSHOVER_ENABLED, "Pushover disabled (set PUSHOVER_ENABLED=true)")
+class TestPushover(unittest.TestCase):
+    """Live Pushover notification check"""
+
+    def test_send_notification(self):
+        """Send a test notification through the configured Pushover account"""
+        from utils.notifier import Notifier
+
+        print(f"PUSHOVER_USER_KEY: {os.getenv('PUSHOVER_USER_KEY', '')[:8]}***")
+        print(f"PUSHOVER_API_TOKEN: {os.getenv('PUSHOVER_API_TOKEN', '')[:8]}***")
+
+        notifier = Notifier()
+        self.assertTrue(notifier.pushover_enabled, "Pushover credentials missing")
+
+        futures = notifier.send("This is a test notification from EcoFlow Power Management",
+                                priority=0,
+                                title="Test Notification")
+        for future in futures:
+            future.result(timeout=10)
+
+        print("Done! Check your Pushover app.")
+
 
 if __name__ == "__main__":
-    main()
+    unittest.main()
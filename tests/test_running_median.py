@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Unit tests for RunningMedian
+
+Tests the running_median module against a sorted-window reference:
+- Five-value window (compare network) and a filling window
+- Windows saturated at a single repeated value
+- Larger windows (heap pair with lazy eviction)
+- push_batch matches repeated push
+"""
+import os
+import sys
+import random
+import unittest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.running_median import RunningMedian
+
+
+def sorted_median(values):
+    """Reference median of a small list"""
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
+
+
+class TestRunningMedian(unittest.TestCase):
+    """Test cases for RunningMedian"""
+
+    def assert_matches_reference(self, k, values):
+        median = RunningMedian(k)
+        for i, value in enumerate(values):
+            expected = sorted_median(values[max(0, i - k + 1):i + 1])
+            self.assertEqual(median.push(value), expected, f"k={k}, reading {i}")
+
+    def test_five_value_window(self):
+        """Default SOC window: filling, then the compare network"""
+        rng = random.Random(5)
+        self.assert_matches_reference(5, [rng.randint(0, 100) for _ in range(200)])
+
+    def test_steady_state_window(self):
+        """Runs of a repeated value (the steady-state shortcut) stay correct"""
+        self.assert_matches_reference(5, [50] * 7 + [51] + [50] * 6 + [49, 49, 50, 50, 50, 50, 50])
+
+    def test_large_window(self):
+        """Heap-pair median matches a sorted window for larger window sizes"""
+        rng = random.Random(7)
+        self.assert_matches_reference(21, [round(rng.uniform(0, 100), 1) for _ in range(500)])
+
+    def test_large_window_monotonic(self):
+        """A steady climb (stale entries buried in the lower heap) stays correct"""
+        self.assert_matches_reference(8, [i * 0.1 for i in range(300)])
+
+    def test_push_batch(self):
+        """push_batch returns the same medians as pushing one at a time"""
+        values = [88, 89, 85, 90, 89, 70, 91]
+        single = RunningMedian(5)
+        expected = [single.push(v) for v in values]
+
+        self.assertEqual(RunningMedian(5).push_batch(values), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
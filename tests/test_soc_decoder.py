@@ -6,13 +6,19 @@ Tests the enhanced BMS validation logic that filters out invalid/ghost
 battery modules to prevent implausible SOC readings.
 """
 
-import sys
 import os
+import sys
 import unittest
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from services.lib.ecoflow_river3plus import EcoFlowDevice
 
+# Precomputed payloads for the common baselines
+# Field 6 (SOC) tag 0x30, Field 16 (Temp) tag 0x80 0x01, 2500 = 0xC4 0x13
+BASELINE_SOC90_TEMP25 = bytes((0x30, 0x5A, 0x80, 0x01, 0xC4, 0x13))
+BASELINE_SOC100_TEMP25 = bytes((0x30, 0x64, 0x80, 0x01, 0xC4, 0x13))
 
 class TestBMSValidation(unittest.TestCase):
     """Test cases for BMS validation logic"""
@@ -23,7 +29,7 @@ class TestBMSValidation(unittest.TestCase):
         
         # Create message with valid BMS module
         # Field 6 (SOC) = 90, Field 16 (Temp) = 2500 (represents 25.0°C after /100)
-        payload = self._create_message(soc=90, temp=2500)
+        payload = BASELINE_SOC90_TEMP25
         
         result = device.update_from_protobuf(payload)
         
@@ -36,7 +42,7 @@ class TestBMSValidation(unittest.TestCase):
         device = EcoFlowDevice("TEST_DEVICE")
         
         # Initialize with valid data first
-        device.update_from_protobuf(self._create_message(soc=90, temp=2500))
+        device.update_from_protobuf(BASELINE_SOC90_TEMP25)
         initial_soc = device.soc
         
         # Send ghost module
@@ -51,7 +57,7 @@ class TestBMSValidation(unittest.TestCase):
         device = EcoFlowDevice("TEST_DEVICE")
         
         # Initialize with valid data
-        device.update_from_protobuf(self._create_message(soc=90, temp=2500))
+        device.update_from_protobuf(BASELINE_SOC90_TEMP25)
         initial_soc = device.soc
         
         # Send partial module (SOC without temperature)
@@ -66,7 +72,7 @@ class TestBMSValidation(unittest.TestCase):
         device = EcoFlowDevice("TEST_DEVICE")
         
         # Initialize with valid data
-        device.update_from_protobuf(self._create_message(soc=90, temp=2500))
+        device.update_from_protobuf(BASELINE_SOC90_TEMP25)
         initial_soc = device.soc
         
         # Send out-of-range SOC
@@ -81,7 +87,7 @@ class TestBMSValidation(unittest.TestCase):
         device = EcoFlowDevice("TEST_DEVICE")
         
         # Initialize with valid data
-        device.update_from_protobuf(self._create_message(soc=90, temp=2500))
+        device.update_from_protobuf(BASELINE_SOC90_TEMP25)
         initial_soc = device.soc
         
         # Send out-of-range SOC (just above 100)
@@ -139,7 +145,7 @@ class TestBMSValidation(unittest.TestCase):
         device = EcoFlowDevice("TEST_DEVICE")
         
         # Initialize with valid data
-        device.update_from_protobuf(self._create_message(soc=90, temp=2500))
+        device.update_from_protobuf(BASELINE_SOC90_TEMP25)
         initial_soc = device.soc
         
         # Send imposter message (temp in range 0-100 indicates enum, not actual temp)
@@ -154,7 +160,7 @@ class TestBMSValidation(unittest.TestCase):
         device = EcoFlowDevice("TEST_DEVICE")
         
         # Test SOC = 100%
-        payload = self._create_message(soc=100, temp=2500)
+        payload = BASELINE_SOC100_TEMP25
         result = device.update_from_protobuf(payload)
         self.assertTrue(result)
         self.assertEqual(device.soc, 100.0, "SOC=100% should be valid")
@@ -165,6 +171,11 @@ class TestBMSValidation(unittest.TestCase):
         self.assertTrue(result)
         self.assertEqual(device.soc, 1.0, "SOC=1% should be valid")
     
+    def test_baseline_payloads_match_encoder(self):
+        """Precomputed baseline payloads must match the message encoder"""
+        self.assertEqual(BASELINE_SOC90_TEMP25, self._create_message(soc=90, temp=2500))
+        self.assertEqual(BASELINE_SOC100_TEMP25, self._create_message(soc=100, temp=2500))
+    
     # === Helper Methods ===
     
     def _create_message_dict(self, soc=None, temp=None, grid=None, power=None):
@@ -5,8 +5,8 @@ Unit tests for BooleanStateFilter
 Tests the state_filter module's ability to filter transient false readings
 in binary state values like grid_connected.
 """
-import sys
 import os
+import sys
 import time
 import unittest
 
@@ -142,6 +142,37 @@ class TestBooleanStateFilter(unittest.TestCase):
         # Verify confirmation count was reset
         self.assertEqual(filter.confirmation_count, 1)
     
+    def test_single_confirmation_needs_two_readings(self):
+        """required_confirmations=1 still ignores a lone glitch"""
+        filter = BooleanStateFilter("TestDevice", "grid_connected", required_confirmations=1)
+        
+        t = time.time()
+        filter.filter(True, t)
+        
+        self.assertTrue(filter.filter(False, t + 1))
+        self.assertFalse(filter.filter(False, t + 2))
+    
+    def test_filter_batch(self):
+        """Batch replay equals calling filter() in a loop on a fresh instance"""
+        readings = [True, False, False, True, False, False, False, False, False, True, True, False]
+        # One 6-minute gap so the replay also crosses a confirmation reset
+        timestamps = list(range(len(readings) - 2)) + [400, 401]
+        
+        loop = BooleanStateFilter("TestDevice", "grid_connected", required_confirmations=5)
+        expected = [loop.filter(r, t) for r, t in zip(readings, timestamps)]
+        
+        batch = BooleanStateFilter("TestDevice", "grid_connected", required_confirmations=5)
+        self.assertEqual(batch.filter_batch(readings, timestamps), expected)
+        self.assertEqual(batch.confirmed_state, loop.confirmed_state)
+        self.assertEqual(batch.confirmation_count, loop.confirmation_count)
+    
+    def test_filter_batch_length_mismatch(self):
+        """filter_batch should refuse readings without matching timestamps"""
+        filter = BooleanStateFilter("TestDevice", "grid_connected")
+        
+        with self.assertRaises(ValueError):
+            filter.filter_batch([True, False], [0])
+    
     def test_custom_confirmation_threshold(self):
         """Test custom confirmation threshold"""
         # Use 3 confirmations instead of default 5
@@ -8,8 +8,13 @@ import os
 import sys
 import hashlib
 import time
+import queue
+from typing import Tuple
 import paho.mqtt.client as mqtt
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.proto_scan import read_varint as _read_varint, looks_like_proto as _looks_like_proto, drain_batch
+
 # --- Config ---
 MQTT_HOST = os.getenv("MQTT_HOST", "mosquitto.hs.mfis.net")
 MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
@@ -18,61 +23,62 @@ MQTT_PASS = os.getenv("MQTT_PASS", "")
 ECOFLOW_BASE = os.getenv("ECOFLOW_BASE", "bridge-ecoflow")
 TARGET_DEVICE = "STUDY"  # Case insensitive
 
+# Precomputed topic filters for on_message
+_TARGET_LOWER = TARGET_DEVICE.lower()
+_DATA_SUFFIX = "/data"
+
 # --- State ---
 seen_fingerprints = set()
 
 
-# --- Helper: Recursive Decoder ---
-def _read_varint(buf: bytes, i: int):
-    shift = 0
-    val = 0
-    while True:
-        if i >= len(buf): raise ValueError("EOF")
-        b = buf[i]
-        i += 1
-        val |= (b & 0x7F) << shift
-        if not (b & 0x80): return val, i
-        shift += 7
+# --- Helper: Decoder ---
+def _bytes_line(prefix: str, data: bytes) -> str:
+    # Show hex for short bytes
+    hex_s = data.hex()[:20] + "..." if len(data) > 10 else data.hex()
+    return f"{prefix}Bytes: {hex_s}"
 
 
 def decode_tree(payload: bytes, indent=0) -> str:
-    """Returns a string representation of the tree for printing"""
+    """Returns a string representation of the tree for printing (bytes or memoryview)"""
     out = []
-    i = 0
-    while i < len(payload):
-        try:
-            tag, i = _read_varint(payload, i)
+    n = len(payload)
+    read_varint = _read_varint
+
+    # Iterative depth-first walk over the original buffer.
+    # Frame: (offset, end, indent, header line index, header prefix, data start, length)
+    stack = [(0, n, indent, -1, "", 0, 0)]
+    while stack:
+        i, end, level, header, header_prefix, data_start, size = stack.pop()
+        descended = False
+
+        while i < end:
+            tag, i = read_varint(payload, i, end)
+            if i < 0: break
             field = tag >> 3
             wtype = tag & 0x7
 
-            prefix = "  " * indent + f"├── [{field}] "
+            prefix = "  " * level + f"├── [{field}] "
 
             if wtype == 0:  # Varint
-                val, i = _read_varint(payload, i)
+                val, i = read_varint(payload, i, end)
+                if i < 0: break
                 out.append(f"{prefix}Int: {val}")
 
             elif wtype == 2:  # Length Delimited
-                ln, i = _read_varint(payload, i)
-                data = payload[i: i + ln]
-
-                # Speculative recursion check
-                is_nested = False
-                if ln > 0:
-                    try:
-                        # Try to decode inner; if it fails or looks junk, treat as bytes
-                        sub_out = decode_tree(data, indent + 1)
-                        if sub_out:
-                            out.append(f"{prefix}Container (len={ln}):")
-                            out.append(sub_out)
-                            is_nested = True
-                    except:
-                        is_nested = False
-
-                if not is_nested:
-                    # Show hex for short bytes
-                    hex_s = data.hex()[:20] + "..." if len(data) > 10 else data.hex()
-                    out.append(f"{prefix}Bytes: {hex_s}")
-
+                ln, i = read_varint(payload, i, end)
+                if i < 0: break
+                sub_end = min(i + ln, end)
+
+                # Only descend when the first tag is structurally valid
+                if ln > 0 and _looks_like_proto(payload, i, sub_end):
+                    out.append(None)  # Container/Bytes line, settled below
+                    # Resume this message once the nested one is done
+                    stack.append((i + ln, end, level, header, header_prefix, data_start, size))
+                    stack.append((i, sub_end, level + 1, len(out) - 1, prefix, i, ln))
+                    descended = True
+                    break
+
+                out.append(_bytes_line(prefix, payload[i:sub_end]))
                 i += ln
 
             elif wtype == 1:  # 64-bit
@@ -84,53 +90,72 @@ def decode_tree(payload: bytes, indent=0) -> str:
             else:
                 break  # Unknown
 
-        except Exception:
-            break
+        # Nested message finished: label it, or fall back to bytes if it decoded nothing
+        if not descended and header >= 0:
+            if len(out) > header + 1:
+                out[header] = f"{header_prefix}Container (len={size}):"
+            else:
+                out[header] = _bytes_line(header_prefix, payload[data_start:end])
 
     return "\n".join(out)
 
 
-def get_structure_fingerprint(payload: bytes) -> str:
-    """Creates a hash based on the TAGS present (ignoring values)"""
+def get_structure_fingerprint(payload: bytes) -> Tuple[int, ...]:
+    """Creates a hashable signature of the TAGS present (ignoring values)"""
     # Simple tag extraction for fingerprinting
     tags = []
     i = 0
-    while i < len(payload):
-        try:
-            tag, i = _read_varint(payload, i)
-            tags.append(str(tag >> 3))
-            wtype = tag & 0x7
-            if wtype == 0:
-                _read_varint(payload, i)
-            elif wtype == 2:
-                ln, i = _read_varint(payload, i)
-                i += ln
-            elif wtype == 1:
-                i += 8
-            elif wtype == 5:
-                i += 4
-            else:
-                break
-        except:
+    n = len(payload)
+    read_varint = _read_varint
+    while i < n:
+        tag, i = read_varint(payload, i)
+        if i < 0: break
+        tags.append(tag >> 3)
+        wtype = tag & 0x7
+        if wtype == 0:
+            _, i = read_varint(payload, i)
+            if i < 0: break
+        elif wtype == 2:
+            ln, i = read_varint(payload, i)
+            if i < 0: break
+            i += ln
+        elif wtype == 1:
+            i += 8
+        elif wtype == 5:
+            i += 4
+        else:
             break
-    return "-".join(tags)
+    return tuple(tags)
+
+
+# --- Message Queue ---
+# on_message only hands raw payloads over; decoding runs in batches off the
+# network thread so the MQTT loop never waits on the scanner.
+inbox = queue.SimpleQueue()  # (topic, payload)
 
 
 # --- MQTT Handler ---
 def on_message(client, userdata, msg):
-    if TARGET_DEVICE.lower() not in msg.topic.lower(): return
-    if not msg.topic.endswith("/data"): return
+    topic = msg.topic
+    # Cheap suffix check first; only lowercase topics that can still match
+    if not topic.endswith(_DATA_SUFFIX): return
+    if _TARGET_LOWER not in topic.lower(): return
+    inbox.put((topic, msg.payload))
+
 
+def process_message(topic: str, payload: bytes):
     # 1. Generate Fingerprint (Signature of fields)
-    fp = get_structure_fingerprint(msg.payload)
+    fp = get_structure_fingerprint(payload)
 
     # 2. If new, print it!
     if fp not in seen_fingerprints:
         seen_fingerprints.add(fp)
-        print(f"\n\n=== NEW MSG TYPE DETECTED [{len(msg.payload)} bytes] ===")
-        print(f"Topic: {msg.topic}")
+        # memoryview so byte fields are sliced as views, not copies
+        tree = decode_tree(memoryview(payload))
+        print(f"\n\n=== NEW MSG TYPE DETECTED [{len(payload)} bytes] ===")
+        print(f"Topic: {topic}")
         print("Decoding...")
-        print(decode_tree(msg.payload))
+        print(tree)
         print("==========================================")
     else:
         # Optional: Print dot for heartbeat
@@ -147,7 +172,13 @@ def main():
 
     print(f"Listening for ALL message types from '{TARGET_DEVICE}'...")
     print("Wait ~30 seconds. You should see different structures appear.")
-    client.loop_forever()
+    client.loop_start()
+    try:
+        while True:
+            for topic, payload in drain_batch(inbox):
+                process_message(topic, payload)
+    finally:
+        client.loop_stop()
 
 
 if __name__ == "__main__":
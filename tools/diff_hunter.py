@@ -8,9 +8,13 @@ import os
 import time
 import sys
 import threading
+from collections import deque
 from typing import Dict, Tuple
 import paho.mqtt.client as mqtt
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.proto_scan import scan_payload_flat
+
 # --- Config ---
 MQTT_HOST = os.getenv("MQTT_HOST", "mosquitto.hs.mfis.net")
 MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
@@ -21,69 +25,68 @@ ECOFLOW_BASE = os.getenv("ECOFLOW_BASE", "bridge-ecoflow")
 # Only process topics containing this string (Case Insensitive)
 TARGET_DEVICE_KEYWORD = "STUDY"
 
+# Precomputed topic filters for on_message
+_TARGET_LOWER = TARGET_DEVICE_KEYWORD.lower()
+_DATA_SUFFIX = "/data"
+
 # --- Global State ---
-latest_state = {}  # { "dDepth_tTag": value }
+# Raw payloads are only decoded when a snapshot is taken, which folds them
+# into current_state. A tag seen only in payloads that fell out of the
+# deque before then keeps its previous value.
+RECENT_PAYLOADS = 64
+recent_payloads = deque(maxlen=RECENT_PAYLOADS)
+current_state: Dict[str, int] = {}  # cumulative { "dDepth_tTag": value }
 lock = threading.Lock()
 
 
 # --- Helpers ---
-def _read_varint(buf: bytes, i: int) -> Tuple[int, int]:
-    shift = 0
-    val = 0
-    while True:
-        if i >= len(buf): raise ValueError("EOF")
-        b = buf[i]
-        i += 1
-        val |= (b & 0x7F) << shift
-        if not (b & 0x80): return val, i
-        shift += 7
-
-
-def scan_payload(payload: bytes, depth=0):
-    """Recursively extracts all integer tags."""
-    i = 0
+# Interned "d{depth}_t{field}" keys, built once per (depth, field) pair
+_KEY_CACHE: Dict[Tuple[int, int], str] = {}
+
+
+def _tag_key(depth: int, field: int) -> str:
+    key = _KEY_CACHE.get((depth, field))
+    if key is None:
+        key = _KEY_CACHE[(depth, field)] = sys.intern(f"d{depth}_t{field}")
+    return key
+
+
+def scan_payload(payload: bytes):
+    """Extracts all integer tags from the payload and nested messages."""
     local_found = {}
-    while i < len(payload):
-        try:
-            tag, i = _read_varint(payload, i)
-            field = tag >> 3
-            wtype = tag & 0x7
-
-            if wtype == 0:  # Varint
-                val, i = _read_varint(payload, i)
-                # Filter massive/negative junk
-                if val < 999999:
-                    local_found[f"d{depth}_t{field}"] = val
-            elif wtype == 2:  # Length Delimited
-                ln, i = _read_varint(payload, i)
-                if ln > 0:
-                    # Recurse
-                    sub = scan_payload(payload[i:i + ln], depth + 1)
-                    local_found.update(sub)
-                i += ln
-            elif wtype == 1:
-                i += 8
-            elif wtype == 5:
-                i += 4
-            else:
-                break
-        except Exception:
-            break
+    tag_key = _tag_key
+    for depth, field, val in scan_payload_flat(payload):
+        # Filter massive/negative junk
+        if val < 999999:
+            local_found[tag_key(depth, field)] = val
     return local_found
 
 
 # --- MQTT ---
 def on_message(client, userdata, msg):
     # 1. Filter for Data
-    if not msg.topic.endswith("/data"): return
+    if not msg.topic.endswith(_DATA_SUFFIX): return
 
     # 2. Strict Filter for STUDY device
-    if TARGET_DEVICE_KEYWORD.lower() not in msg.topic.lower():
+    if _TARGET_LOWER not in msg.topic.lower():
         return
 
-    vals = scan_payload(msg.payload)
     with lock:
-        latest_state.update(vals)
+        recent_payloads.append(msg.payload)
+
+
+def take_snapshot() -> Dict[str, int]:
+    """
+    Folds buffered payloads (oldest first) into current_state and returns
+    a copy of it: every tag seen so far, with its latest value.
+    """
+    with lock:
+        payloads = list(recent_payloads)
+        recent_payloads.clear()
+
+    for payload in payloads:
+        current_state.update(scan_payload(payload))
+    return dict(current_state)
 
 
 # --- Interactive Mode ---
@@ -95,17 +98,14 @@ def main():
     client.subscribe(f"{ECOFLOW_BASE}/+/data")
 
     # Start BG Thread
-    t = threading.Thread(target=client.loop_forever)
-    t.daemon = True
-    t.start()
+    client.loop_start()
 
     print("\n=== EcoFlow Diff Hunter (Target: STUDY) ===")
     print("1. Ensure 'STUDY' device is PLUGGED IN (AC Connected).")
     print("2. Waiting 10s to build baseline...")
     time.sleep(10)
 
-    with lock:
-        snapshot_a = latest_state.copy()
+    snapshot_a = take_snapshot()
 
     if not snapshot_a:
         print("\n[ERROR] No data received from 'STUDY'. Check if device name matches exactly.")
@@ -117,8 +117,7 @@ def main():
     print("   Listening for updates (10s)...")
     time.sleep(10)
 
-    with lock:
-        snapshot_b = latest_state.copy()
+    snapshot_b = take_snapshot()
 
     print("\n=== Analysis Results (Study Unit) ===")
     print(f"{'TAG':<20} | {'PLUGGED':<10} | {'UNPLUGGED':<10} | {'DIFF'}")
@@ -7,9 +7,13 @@ import os
 import time
 import sys
 import threading
-from typing import Tuple, List, Dict
+import queue
+from typing import Dict, Optional
 import paho.mqtt.client as mqtt
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.proto_scan import scan_payload_flat, drain_batch
+
 # --- Configuration ---
 # Update these ranges based on your actual loads (Watts * 10)
 # Example: 100W load -> search for 1000 +/- tolerance
@@ -26,68 +30,61 @@ MQTT_USER = os.getenv("MQTT_USER", "")
 MQTT_PASS = os.getenv("MQTT_PASS", "")
 ECOFLOW_BASE = os.getenv("ECOFLOW_BASE", "bridge-ecoflow")
 
-# --- Helpers (Standard Varint Decoder) ---
-def _read_varint(buf: bytes, i: int) -> Tuple[int, int]:
-    shift = 0
-    val = 0
-    while True:
-        if i >= len(buf): raise ValueError("EOF")
-        b = buf[i]
-        i += 1
-        val |= (b & 0x7F) << shift
-        if not (b & 0x80): return val, i
-        shift += 7
-
-def scan_payload(payload: bytes, depth=0) -> Dict[str, int]:
-    """Recursively scans for integer values."""
-    results = {}
-    i = 0
-    while i < len(payload):
-        try:
-            tag, i = _read_varint(payload, i)
-            field = tag >> 3
-            wtype = tag & 0x7
-
-            if wtype == 0: # Varint
-                val, i = _read_varint(payload, i)
-                results[f"d{depth}_t{field}"] = val
-            elif wtype == 2: # Length Delimited
-                ln, i = _read_varint(payload, i)
-                # Try recursive scan
-                if ln > 0:
-                    try:
-                        sub_results = scan_payload(payload[i:i+ln], depth + 1)
-                        results.update(sub_results)
-                    except:
-                        pass
-                i += ln
-            elif wtype == 1: i += 8
-            elif wtype == 5: i += 4
-            else: break
-        except Exception:
-            break
+# --- Helpers ---
+# Tags are keyed by a packed int (depth << 29 | field): cheaper to hash than
+# "d{depth}_t{field}" strings, which are only built for display. 29 bits is
+# the protobuf field number range; larger "fields" only come from junk bytes.
+_DEPTH_SHIFT = 29
+_FIELD_MASK = (1 << _DEPTH_SHIFT) - 1
+
+
+def unpack_tag(key: int) -> str:
+    """Renders a packed tag key as "d{depth}_t{field}" """
+    return f"d{key >> _DEPTH_SHIFT}_t{key & _FIELD_MASK}"
+
+
+def scan_payload(payload: bytes, out: Optional[dict] = None) -> Dict[int, int]:
+    """Scans the payload and all nested messages for integer values."""
+    results = {} if out is None else out
+    for depth, field, val in scan_payload_flat(payload):
+        if field <= _FIELD_MASK:
+            results[(depth << _DEPTH_SHIFT) | field] = val
     return results
 
 # --- Main Logic ---
 known_candidates = {k: set() for k in TARGETS}
 
+# Flattened once at startup: (label, low, high, candidate set) per target
+_TARGET_RANGES = tuple(
+    (label, low, high, known_candidates[label])
+    for label, (low, high) in TARGETS.items()
+)
+_SIGNED_THRESHOLD = 4294900000
+_UINT32_WRAP = 1 << 32
+
+# --- Message Queue ---
+# on_message only hands raw payloads over; decoding runs in batches off the
+# network thread so the MQTT loop never waits on the scanner.
+inbox = queue.SimpleQueue()  # (topic, payload)
+
+
 def on_message(client, userdata, msg):
     if not msg.topic.endswith("/data"): return
+    inbox.put((msg.topic, msg.payload))
 
+def process_message(topic: str, payload: bytes):
     # Decode everything
-    values = scan_payload(msg.payload)
+    values = scan_payload(payload)
 
     # Check against targets
     for tag, val in values.items():
         # Handle "Signed" values appearing as Unsigned large ints
-        real_val = val
-        if val > 4294900000: real_val = val - 4294967296
+        real_val = val - _UINT32_WRAP if val > _SIGNED_THRESHOLD else val
 
-        for label, (low, high) in TARGETS.items():
-            if low <= real_val <= high:
-                if tag not in known_candidates[label]:
-                    print(f"MATCH FOUND: {label} could be {tag} (Value: {real_val})")
-                    known_candidates[label].add(tag)
+        for label, low, high, seen in _TARGET_RANGES:
+            if low <= real_val <= high and tag not in seen:
+                print(f"MATCH FOUND: {label} could be {unpack_tag(tag)} (Value: {real_val})")
+                seen.add(tag)
 
 def main():
     print("--- EcoFlow Tag Hunter ---")
@@ -100,12 +97,16 @@ def main():
     client.connect(MQTT_HOST, MQTT_PORT, 60)
     client.subscribe(f"{ECOFLOW_BASE}/+/data")
 
+    client.loop_start()
     try:
-        client.loop_forever()
+        while True:
+            for topic, payload in drain_batch(inbox):
+                process_message(topic, payload)
     except KeyboardInterrupt:
+        client.loop_stop()
         print("\n\n--- SUMMARY OF CANDIDATES ---")
         for label, tags in known_candidates.items():
-            print(f"{label}: {tags}")
+            print(f"{label}: {sorted(unpack_tag(t) for t in tags)}")
 
 if __name__ == "__main__":
     main()
@@ -5,20 +5,27 @@ import hashlib
 import random
 import sys
 
-# Load .env manually to be standalone
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
-if os.path.exists(env_path):
-    with open(env_path, 'r') as f:
-        for line in f:
-            if line.strip() and not line.startswith('#') and '=' in line:
-                k, v = line.strip().split('=', 1)
-                os.environ[k] = v.strip().strip("'").strip('"')
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+from utils.env_loader import load_env
+
+# The project .env wins over the shell: a stale exported ECOFLOW_* key must
+# not silently sign with the wrong credentials
+ENV_PATH = os.path.join(PROJECT_ROOT, ".env")
+if os.path.exists(ENV_PATH):
+    load_env(env_path=ENV_PATH, override=True)
 
 ACCESS_KEY = os.getenv("ECOFLOW_ACCESS_KEY", "")
 SECRET_KEY = os.getenv("ECOFLOW_SECRET_KEY", "")
 HOST = "https://api-e.ecoflow.com"
 
+# Keyed HMAC state, derived once and copied per signature
+_HMAC_TEMPLATE = hmac.new(SECRET_KEY.encode('utf-8'), None, hashlib.sha256) if SECRET_KEY else None
+
 def get_signed_url(endpoint, params):
+    if _HMAC_TEMPLATE is None:
+        raise ValueError("ECOFLOW_SECRET_KEY is not configured; cannot sign requests")
+
     # 1. Add Auth Params
     params["accessKey"] = ACCESS_KEY
     params["nonce"] = str(random.randint(100000, 999999))
@@ -26,14 +33,12 @@ def get_signed_url(endpoint, params):
     
     # 2. Sort & Build String
     sorted_keys = sorted(params.keys())
-    sign_str = "&".join([f"{k}={params[k]}" for k in sorted_keys])
+    sign_str = "&".join(f"{k}={params[k]}" for k in sorted_keys)
     
     # 3. Sign
-    signature = hmac.new(
-        SECRET_KEY.encode('utf-8'),
-        sign_str.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
+    h = _HMAC_TEMPLATE.copy()
+    h.update(sign_str.encode('utf-8'))
+    signature = h.hexdigest()
     
     # 4. Return Full URL
     return f"{HOST}{endpoint}?{sign_str}&sign={signature}"
@@ -7,9 +7,12 @@ import os
 import json
 import time
 import sys
-from typing import Tuple, List
+import queue
 import paho.mqtt.client as mqtt
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.proto_scan import read_varint as _read_varint, looks_like_proto as _looks_like_proto, drain_batch
+
 # --- Configuration ---
 MQTT_HOST = os.getenv("MQTT_HOST", "mosquitto.hs.mfis.net")
 MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
@@ -18,83 +21,85 @@ MQTT_PASS = os.getenv("MQTT_PASS", "")
 ECOFLOW_BASE = os.getenv("ECOFLOW_BASE", "bridge-ecoflow")
 
 # --- Helpers ---
-def _read_varint(buf: bytes, i: int) -> Tuple[int, int]:
-    shift = 0
-    val = 0
-    while True:
-        if i >= len(buf): raise ValueError("EOF")
-        b = buf[i]
-        i += 1
-        val |= (b & 0x7F) << shift
-        if not (b & 0x80): return val, i
-        shift += 7
-
-def scan_fields(payload: bytes, depth=0):
-    i = 0
-    results = {}
-    
-    while i < len(payload):
-        try:
-            start_i = i
-            tag, i = _read_varint(payload, i)
+def scan_fields(payload: bytes):
+    root = {}
+    n = len(payload)
+    read_varint = _read_varint
+
+    # Iterative depth-first walk. Frame: (offset, end, results, parent, key, length)
+    stack = [(0, n, root, None, None, 0)]
+    while stack:
+        i, end, results, parent, key, size = stack.pop()
+        descended = False
+
+        while i < end:
+            tag, i = read_varint(payload, i, end)
+            if i < 0: break
             field = tag >> 3
             wtype = tag & 0x7
-            
+
             value = None
-            
+
             if wtype == 0: # Varint (Int, Bool, Enum)
-                val, i = _read_varint(payload, i)
+                val, i = read_varint(payload, i, end)
+                if i < 0: break
                 value = val
                 # Heuristic: Large varints might be signed
                 if val > 2147483647: value = f"{val} (raw) / {val-4294967296} (signed)"
-                
+
             elif wtype == 1: # 64-bit
                 i += 8
                 value = "[64-bit Data]"
-                
+
             elif wtype == 2: # Length Delimited (String, Bytes, Nested Msg)
-                ln, i = _read_varint(payload, i)
-                data = payload[i : i + ln]
+                ln, i = read_varint(payload, i, end)
+                if i < 0: break
+                sub_end = min(i + ln, end)
+
+                # NESTED CHECK: If it starts with a valid varint tag, scan it.
+                if ln > 0 and _looks_like_proto(payload, i, sub_end):
+                    sub_results = {}
+                    results[f"Tag_{field}"] = sub_results
+                    # Resume this message once the nested one is done
+                    stack.append((i + ln, end, results, parent, key, size))
+                    stack.append((i, sub_end, sub_results, results, f"Tag_{field}", ln))
+                    descended = True
+                    break
+
                 i += ln
-                
-                # RECURSIVE CHECK: Does this look like a nested message?
-                # If it starts with a valid varint tag, we try to scan it.
-                is_nested = False
-                if ln > 0:
-                    try:
-                        # Attempt to scan sub-message
-                        sub_scan = scan_fields(data, depth + 1)
-                        if sub_scan: # If we found valid fields
-                            value = sub_scan
-                            is_nested = True
-                    except:
-                        pass
-                
-                if not is_nested:
-                    value = f"[Bytes len={ln}]"
+                value = f"[Bytes len={ln}]"
 
             elif wtype == 5: # 32-bit (Float usually)
                 i += 4
                 value = "[32-bit Data]"
             else:
                 break
-            
+
             results[f"Tag_{field}"] = value
-            
-        except Exception:
-            break
-            
-    return results
+
+        # Nothing decoded from a nested candidate: show it as raw bytes
+        if not descended and parent is not None and not results:
+            parent[key] = f"[Bytes len={size}]"
+
+    return root
+
+# --- Message Queue ---
+# on_message only hands raw payloads over; decoding runs in batches off the
+# network thread so the MQTT loop never waits on the scanner.
+inbox = queue.SimpleQueue()  # (topic, payload)
+
 
 # --- MQTT Handlers ---
 def on_message(client, userdata, msg):
     # Only look at data topics
     if not msg.topic.endswith("/data"): return
-    
-    print(f"\n--- Message from {msg.topic} ---")
+    inbox.put((msg.topic, msg.payload))
+
+def process_message(topic: str, payload: bytes):
+    print(f"\n--- Message from {topic} ---")
     
     # 1. Try generic scan
-    decoded = scan_fields(msg.payload)
+    decoded = scan_fields(payload)
     
     # 2. Flatten for display
     def print_tree(d, indent=0):
@@ -115,7 +120,13 @@ def main():
     client.connect(MQTT_HOST, MQTT_PORT, 60)
     client.subscribe(f"{ECOFLOW_BASE}/+/data")
     print(f"Scanning {ECOFLOW_BASE}/+/data ... Press Ctrl+C to stop.")
-    client.loop_forever()
+    client.loop_start()
+    try:
+        while True:
+            for topic, payload in drain_batch(inbox):
+                process_message(topic, payload)
+    finally:
+        client.loop_stop()
 
 if __name__ == "__main__":
     main()
@@ -9,123 +9,150 @@ decoding issues like:
 - Bit shifting
 - Multi-byte field alignment
 """
+import sys
+
+
+def encode_varint(value):
+    """Encode value as protobuf varint"""
+    # Fast path: values below 128 are a single byte
+    if value <= 0x7F:
+        return bytes((value & 0x7F,))
+    # Byte count is known up front from the bit length: 7 payload bits per byte
+    nbytes = (value.bit_length() + 6) // 7
+    buf = bytearray(nbytes)
+    for i in range(nbytes - 1):
+        buf[i] = ((value >> (7 * i)) & 0x7F) | 0x80
+    buf[nbytes - 1] = value >> (7 * (nbytes - 1))
+    return bytes(buf)
+
+
+def decode_varint(data):
+    """Decode protobuf varint"""
+    if not data:
+        return 0
+    # Fast path: values below 128 are a single byte
+    b0 = data[0]
+    if b0 < 0x80:
+        return b0
+    # Two-byte values (128..16383) without entering the loop
+    if len(data) > 1 and data[1] < 0x80:
+        return (b0 & 0x7F) | (data[1] << 7)
+    result = 0
+    shift = 0
+    for byte in data:
+        result |= (byte & 0x7F) << shift
+        if not (byte & 0x80):
+            return result
+        shift += 7
+    return result
+
 
 def analyze_soc_patterns():
     """Analyze the bit patterns of observed anomalous SOC values"""
     
+    # Report lines are collected and written to stdout in one go
+    out = []
+    p = out.append
+    
     # Known good value
     good_soc = 90
     
     # Anomalous values from logs
     anomalous_values = [16, 24, 33, 48, 56, 65, 82, 97]
     
-    print("=" * 80)
-    print("BIT PATTERN ANALYSIS")
-    print("=" * 80)
+    # Bitwise comparisons against the good value, computed once in bulk
+    xor_diffs = [val ^ good_soc for val in anomalous_values]
+    and_masks = [val & good_soc for val in anomalous_values]
+    or_masks = [val | good_soc for val in anomalous_values]
     
-    print(f"\n✓ GOOD VALUE: {good_soc}%")
-    print(f"   Binary:  {good_soc:08b} (0x{good_soc:02X})")
-    print(f"   Decimal: {good_soc}")
+    p("=" * 80)
+    p("BIT PATTERN ANALYSIS")
+    p("=" * 80)
     
-    print(f"\n⚠ ANOMALOUS VALUES:")
-    print(f"{'Value':<10} {'Binary':<15} {'Hex':<8} {'Bit Diff from 90':<20}")
-    print("-" * 80)
+    p(f"\n✓ GOOD VALUE: {good_soc}%")
+    p(f"   Binary:  {good_soc:08b} (0x{good_soc:02X})")
+    p(f"   Decimal: {good_soc}")
     
-    for val in anomalous_values:
-        diff = val ^ good_soc  # XOR to see bit differences
-        print(f"{val:<10} {val:08b}    0x{val:02X}    XOR: {diff:08b} (0x{diff:02X})")
+    p(f"\n⚠ ANOMALOUS VALUES:")
+    p(f"{'Value':<10} {'Binary':<15} {'Hex':<8} {'Bit Diff from 90':<20}")
+    p("-" * 80)
+    
+    for val, diff in zip(anomalous_values, xor_diffs):  # XOR to see bit differences
+        p(f"{val:<10} {val:08b}    0x{val:02X}    XOR: {diff:08b} (0x{diff:02X})")
     
     # Check for patterns
-    print("\n" + "=" * 80)
-    print("PATTERN ANALYSIS")
-    print("=" * 80)
+    p("\n" + "=" * 80)
+    p("PATTERN ANALYSIS")
+    p("=" * 80)
     
     # Check if values could be bit-shifted versions
-    print("\n1. BIT SHIFT ANALYSIS:")
+    p("\n1. BIT SHIFT ANALYSIS:")
     for shift in [1, 2, 3, 4]:
         shifted_right = good_soc >> shift
         shifted_left = good_soc << shift
-        print(f"   90 >> {shift} = {shifted_right:3d} (0b{shifted_right:08b})")
-        print(f"   90 << {shift} = {shifted_left:3d} (0b{shifted_left:08b})")
+        p(f"   90 >> {shift} = {shifted_right:3d} (0b{shifted_right:08b})")
+        p(f"   90 << {shift} = {shifted_left:3d} (0b{shifted_left:08b})")
     
     # Check if values could be from different byte interpretations
-    print("\n2. BYTE INTERPRETATION:")
+    p("\n2. BYTE INTERPRETATION:")
     # 90 as different integer types
     good_bytes = good_soc.to_bytes(8, byteorder='little')
-    print(f"   90 as bytes (little-endian): {good_bytes.hex()}")
+    p(f"   90 as bytes (little-endian): {good_bytes.hex()}")
+    good_byteset = frozenset(good_bytes)
     
     # Try to reverse engineer what could produce these values
-    print("\n3. REVERSE ENGINEERING ANOMALIES:")
-    for val in anomalous_values:
+    p("\n3. REVERSE ENGINEERING ANOMALIES:")
+    for val, diff, possible_and, possible_or in zip(anomalous_values, xor_diffs, and_masks, or_masks):
         # What would need to happen to 90 to get this value?
-        print(f"\n   {val}:")
+        p(f"\n   {val}:")
         
         # Check if it's in the byte representation
-        if val in good_bytes:
-            print(f"      ✓ Found in byte stream at position {good_bytes.index(val)}")
+        if val in good_byteset:
+            p(f"      ✓ Found in byte stream at position {good_bytes.index(val)}")
         
         # Check bit flips
-        flipped_bits = bin(val ^ good_soc).count('1')
-        print(f"      Bit flips from 90: {flipped_bits}")
+        flipped_bits = diff.bit_count()
+        p(f"      Bit flips from 90: {flipped_bits}")
         
         # Check if it could be from combining with another value
         if val < good_soc:
-            possible_and = val & good_soc
-            possible_or = val | good_soc
-            print(f"      {val} & 90 = {possible_and}")
-            print(f"      {val} | 90 = {possible_or}")
+            p(f"      {val} & 90 = {possible_and}")
+            p(f"      {val} | 90 = {possible_or}")
     
     # Check varint encoding
-    print("\n" + "=" * 80)
-    print("PROTOBUF VARINT ENCODING")
-    print("=" * 80)
-    
-    def encode_varint(value):
-        """Encode value as protobuf varint"""
-        result = []
-        while value > 0x7F:
-            result.append((value & 0x7F) | 0x80)
-            value >>= 7
-        result.append(value & 0x7F)
-        return bytes(result)
-    
-    def decode_varint(data):
-        """Decode protobuf varint"""
-        result = 0
-        shift = 0
-        for byte in data:
-            result |= (byte & 0x7F) << shift
-            if not (byte & 0x80):
-                return result
-            shift += 7
-        return result
-    
-    print(f"\nVarint encoding of 90:")
+    p("\n" + "=" * 80)
+    p("PROTOBUF VARINT ENCODING")
+    p("=" * 80)
+    
+    p(f"\nVarint encoding of 90:")
     varint_90 = encode_varint(good_soc)
-    print(f"   Bytes: {varint_90.hex()} = {[f'0x{b:02X}' for b in varint_90]}")
-    print(f"   Binary: {' '.join([f'{b:08b}' for b in varint_90])}")
-    print(f"   Decoded back: {decode_varint(varint_90)}")
+    p(f"   Bytes: {varint_90.hex()} = {[f'0x{b:02X}' for b in varint_90]}")
+    p(f"   Binary: {' '.join([f'{b:08b}' for b in varint_90])}")
+    p(f"   Decoded back: {decode_varint(varint_90)}")
     
-    print(f"\nVarint encoding of anomalous values:")
+    p(f"\nVarint encoding of anomalous values:")
     for val in anomalous_values:
         varint = encode_varint(val)
-        print(f"   {val:3d}: {varint.hex()} = {[f'0x{b:02X}' for b in varint]} -> decodes to {decode_varint(varint)}")
+        p(f"   {val:3d}: {varint.hex()} = {[f'0x{b:02X}' for b in varint]} -> decodes to {decode_varint(varint)}")
     
     # Check if corruption could happen from partial reads
-    print("\n" + "=" * 80)
-    print("PARTIAL READ / CORRUPTION ANALYSIS")
-    print("=" * 80)
+    p("\n" + "=" * 80)
+    p("PARTIAL READ / CORRUPTION ANALYSIS")
+    p("=" * 80)
     
     # What if we're reading the wrong bytes?
     test_buffer = bytearray([0x5A, 0x10, 0x18, 0x21, 0x30, 0x38, 0x41, 0x52, 0x61])
-    print(f"\nTest buffer: {test_buffer.hex()}")
-    print(f"Decimal values: {list(test_buffer)}")
+    p(f"\nTest buffer: {test_buffer.hex()}")
+    p(f"Decimal values: {list(test_buffer)}")
+    test_byteset = frozenset(test_buffer)
     
     # Check if anomalous values appear
     for val in anomalous_values:
-        if val in test_buffer:
+        if val in test_byteset:
             idx = test_buffer.index(val)
-            print(f"   ✓ {val} found at index {idx} (0x{val:02X})")
+            p(f"   ✓ {val} found at index {idx} (0x{val:02X})")
+    
+    sys.stdout.write("\n".join(out) + "\n")
 
 if __name__ == "__main__":
     analyze_soc_patterns()
@@ -6,6 +6,7 @@ Validates required environment variables and provides helpful error messages.
 import os
 import json
 import sys
+from functools import lru_cache
 
 
 class ConfigValidator:
@@ -28,6 +29,19 @@ class ConfigValidator:
         ("POLICY_COOLDOWN_SEC", "300", int),
     ]
     
+    # Every variable read by validate_all / print_config_summary
+    ENV_KEYS = tuple(
+        [name for name, _ in REQUIRED_CREDENTIALS + REQUIRED_MQTT]
+        + [name for name, _, _ in OPTIONAL_CONFIG]
+        + ["DEVICE_TO_AGENTS_JSON"]
+    )
+    
+    @staticmethod
+    def _env_snapshot() -> dict:
+        """Read all configuration variables from the environment in one pass"""
+        environ = os.environ
+        return {key: environ[key] for key in ConfigValidator.ENV_KEYS if key in environ}
+    
     @staticmethod
     def validate_all():
         """
@@ -35,10 +49,11 @@ class ConfigValidator:
         Returns True if valid, exits with error message if invalid.
         """
         errors = []
+        env = ConfigValidator._env_snapshot()
         
         # Check required credentials
         for var_name, description in ConfigValidator.REQUIRED_CREDENTIALS:
-            value = os.environ.get(var_name, "").strip()
+            value = env.get(var_name, "").strip()
             if not value:
                 errors.append(
                     f"❌ {var_name} not found\n"
@@ -48,7 +63,7 @@ class ConfigValidator:
         
         # Check required MQTT config
         for var_name, description in ConfigValidator.REQUIRED_MQTT:
-            value = os.environ.get(var_name, "").strip()
+            value = env.get(var_name, "").strip()
             if not value:
                 errors.append(
                     f"❌ {var_name} not found\n"
@@ -57,7 +72,7 @@ class ConfigValidator:
                 )
         
         # Validate MQTT_PORT is a valid integer
-        mqtt_port = os.environ.get("MQTT_PORT", "1883")
+        mqtt_port = env.get("MQTT_PORT", "1883")
         try:
             int(mqtt_port)
         except ValueError:
@@ -68,7 +83,7 @@ class ConfigValidator:
             )
         
         # Validate DEVICE_TO_AGENTS_JSON if present
-        device_json = os.environ.get("DEVICE_TO_AGENTS_JSON", "").strip()
+        device_json = env.get("DEVICE_TO_AGENTS_JSON", "").strip()
         if device_json:
             try:
                 json.loads(device_json)
@@ -101,42 +116,52 @@ class ConfigValidator:
     @staticmethod
     def print_config_summary():
         """Print a summary of loaded configuration (without sensitive data)"""
-        print("\n" + "="*70)
-        print("📋 Configuration Summary")
-        print("="*70)
+        env = ConfigValidator._env_snapshot()
+        print(ConfigValidator._format_summary(tuple(env.items())))
+    
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _format_summary(env_items: tuple) -> str:
+        """Build the summary text; cached until the configuration changes"""
+        env = dict(env_items)
+        lines = [
+            "\n" + "="*70,
+            "📋 Configuration Summary",
+            "="*70,
+        ]
         
         # Credentials (masked)
-        access_key = os.environ.get("ECOFLOW_ACCESS_KEY", "")
+        access_key = env.get("ECOFLOW_ACCESS_KEY", "")
         if access_key:
-            print(f"  Access Key:      {access_key[:8]}***")
+            lines.append(f"  Access Key:      {access_key[:8]}***")
         
         # Devices
-        devices = os.environ.get("ECOFLOW_DEVICE_LIST", "").split(",")
-        device_count = len([d for d in devices if d.strip()])
-        print(f"  Devices:         {device_count} configured")
+        devices = env.get("ECOFLOW_DEVICE_LIST", "").split(",")
+        device_count = sum(1 for d in devices if d.strip())
+        lines.append(f"  Devices:         {device_count} configured")
         
         # MQTT
-        mqtt_host = os.environ.get("MQTT_HOST", "localhost")
-        mqtt_port = os.environ.get("MQTT_PORT", "1883")
-        print(f"  MQTT Broker:     {mqtt_host}:{mqtt_port}")
+        mqtt_host = env.get("MQTT_HOST", "localhost")
+        mqtt_port = env.get("MQTT_PORT", "1883")
+        lines.append(f"  MQTT Broker:     {mqtt_host}:{mqtt_port}")
         
         # Policy
-        soc_min = os.environ.get("POLICY_SOC_MIN", "10")
-        debounce = os.environ.get("POLICY_DEBOUNCE_SEC", "180")
-        print(f"  Policy:          Shutdown at {soc_min}% (debounce: {debounce}s)")
+        soc_min = env.get("POLICY_SOC_MIN", "10")
+        debounce = env.get("POLICY_DEBOUNCE_SEC", "180")
+        lines.append(f"  Policy:          Shutdown at {soc_min}% (debounce: {debounce}s)")
         
         # Agent mapping
-        device_json = os.environ.get("DEVICE_TO_AGENTS_JSON", "{}").strip()
+        device_json = env.get("DEVICE_TO_AGENTS_JSON", "{}").strip()
         if device_json:
             try:
                 mapping = json.loads(device_json)
                 agent_count = sum(len(agents) for agents in mapping.values())
-                print(f"  Agent Mapping:   {len(mapping)} devices → {agent_count} agents")
+                lines.append(f"  Agent Mapping:   {len(mapping)} devices → {agent_count} agents")
             except:
                 pass
         
-        print("="*70 + "\n")
-
+        lines.append("="*70 + "\n")
+        return "\n".join(lines)
 
 if __name__ == "__main__":
     # For testing
@@ -1,12 +1,82 @@
+import mmap
 import os
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
+__all__ = ['load_env']
 
-def load_env():
+# One KEY=value assignment per match. Quoted values may span several lines
+# (multi-line JSON); unquoted values end at an inline '#' comment.
+# Bytes pattern: it runs directly over the memory-mapped file.
+# A backslash escapes the next character, except a quote that closes the
+# value (end of line or comment follows): KEY="C:\dir\" is C:\dir\.
+_CLOSES = rb"[ \t\r]*(?:\#[^\n]*)?$"
+_ENV_RE = re.compile(
+    rb"""
+    ^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*
+    (?:
+        "((?:[^"\\]|\\(?!"%(closes)s)[^\r\n]|\\(?="%(closes)s))*)"  # double-quoted
+      | '((?:[^'\\]|\\(?!'%(closes)s)[^\r\n]|\\(?='%(closes)s))*)'  # single-quoted
+      | ([^\#\n]*)                                                 # bare
+    )
+    %(closes)s
+    """ % {b"closes": _CLOSES},
+    re.MULTILINE | re.VERBOSE,
+)
+
+# .env path -> mtime at the last parse; an unchanged file is not re-read
+_parsed_mtimes: Dict[str, float] = {}
+
+
+def load_env(required_keys: Iterable[str] = (), env_path: Optional[str] = None, override: bool = False):
     """
     Searches for a .env file in the project root (up to 2 levels up)
     and loads variables into os.environ.
     Supports multi-line values enclosed in quotes.
+
+    If required_keys is given and all of them are already set in
+    os.environ, the file is not read at all. A file that has not changed
+    since it was last loaded is not parsed again.
+
+    env_path skips the search and loads that file instead.
+
+    override lets values from the file replace variables already set in
+    the environment (the default keeps the environment's values). The file
+    is then always read: neither shortcut above applies, since an earlier
+    non-override load (e.g. the import-time autoload) may have left
+    environment values in place.
     """
+    if not override and required_keys and all(key in os.environ for key in required_keys):
+        return
+
+    if env_path is None:
+        env_path = _find_env_file()
+    if not env_path:
+        # Silent fail or print warning? Silent is usually better for prod,
+        # but for this setup we want to know.
+        # print("Info: No .env file found.")
+        return
+
+    try:
+        with open(env_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if not override and _parsed_mtimes.get(env_path) == st.st_mtime:
+                return
+            if st.st_size:  # mmap refuses empty files
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if override:
+                        os.environ.update(_iter_env_pairs(data))
+                    else:
+                        for key, value in _iter_env_pairs(data):
+                            # Only set if not already set (don't overwrite system env vars)
+                            os.environ.setdefault(key, value)
+        _parsed_mtimes[env_path] = st.st_mtime
+    except Exception as e:
+        print(f"Error loading .env: {e}")
+
+
+def _find_env_file() -> Optional[str]:
+    """Return the first .env in this directory or up to 2 levels up"""
     # Start from the file's current location and go up
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -17,70 +87,31 @@ def load_env():
         os.path.join(os.path.dirname(os.path.dirname(current_dir)), '.env')
     ]
 
-    env_path = None
     for path in possible_paths:
         if os.path.exists(path):
-            env_path = path
-            break
+            return path
+    return None
 
-    if not env_path:
-        # Silent fail or print warning? Silent is usually better for prod,
-        # but for this setup we want to know.
-        # print("Info: No .env file found.")
-        return
 
-    try:
-        with open(env_path, 'r') as f:
-            lines = f.readlines()
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                # Skip empty lines and comments
-                if not line or line.startswith('#'):
-                    i += 1
-                    continue
-
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip()
-                    
-                    # Strip inline comments (everything after # that's not in quotes)
-                    if '#' in value and not (value.startswith('"') or value.startswith("'")):
-                        value = value.split('#')[0].strip()
-
-                    # Handle multi-line values (JSON, etc.)
-                    if value.startswith(('"', "'")):
-                        quote_char = value[0]
-                        # Check if value ends with matching quote
-                        if not value.endswith(quote_char):
-                            # Multi-line value - collect until closing quote
-                            i += 1
-                            while i < len(lines):
-                                next_line = lines[i].rstrip()
-                                value += '\n' + next_line
-                                if next_line.endswith(quote_char):
-                                    break
-                                i += 1
-
-                        # Remove surrounding quotes
-                        if (value.startswith('"') and value.endswith('"')) or \
-                                (value.startswith("'") and value.endswith("'")):
-                            value = value[1:-1]
-                    
-                    # Final trim
-                    value = value.strip()
-
-                    # Only set if not already set (don't overwrite system env vars)
-                    if key not in os.environ:
-                        os.environ[key] = value
-                
-                i += 1
-    except Exception as e:
-        print(f"Error loading .env: {e}")
+def _iter_env_pairs(data: bytes) -> Iterator[Tuple[str, str]]:
+    """Yield (key, value) for every assignment in .env-formatted bytes"""
+    for m in _ENV_RE.finditer(data):
+        double_quoted, single_quoted, bare = m.group(2, 3, 4)
+        if double_quoted is not None:
+            value = double_quoted
+        elif single_quoted is not None:
+            value = single_quoted
+        else:
+            value = bare
+        value = value.decode('utf-8').strip()
+        if '\r' in value:  # CRLF file: multi-line values keep plain newlines
+            value = value.replace('\r\n', '\n')
+        yield m.group(1).decode('ascii'), value
 
 
 # Automatically load when imported?
 # Usually better to be explicit, but for this use case, auto-load on import is convenient.
-load_env()
\ No newline at end of file
+# Set ECOFLOW_AUTOLOAD_ENV=0 (e.g. when systemd/Docker provides the environment)
+# to skip it and call load_env() from the entrypoint instead.
+if os.environ.get("ECOFLOW_AUTOLOAD_ENV", "1") != "0":
+    load_env()
\ No newline at end of file
@@ -3,36 +3,136 @@ Notification service for EcoFlow Power Management.
 
 Supports Pushover and Telegram notifications for critical events.
 Optional - system works without notifications if not configured.
+
+Use get_notifier() to obtain the shared instance rather than constructing
+Notifier directly, so the HTTP session and worker pool are reused.
 """
 import os
+import json
 import logging
+import math
 import re
+import time
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from functools import lru_cache, partial
 import requests
-from typing import Optional, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Optional, List, Tuple
 
 logger = logging.getLogger("notifier")
 
+# Message bodies for the high-level notification methods (HTML for Telegram;
+# tags are stripped for Pushover)
+_TPL_GRID_LOST = "⚠️ <b>AC Input Lost or battery charge limit exceeded</b>\n\nDevice: {device}\nBattery is discharging to loads"
+_TPL_SOC_WARNING = "{emoji} <b>Battery Low</b>\n\nDevice: {device}\nCurrent: {soc}%\nThreshold: {threshold}%"
+_TPL_SHUTDOWN = "🛑 <b>Shutdown Initiated</b>\n\nDevice: {device}\nAgents:\n{agents}"
+_TPL_GRID_RESTORED = "✅ <b>Pass-through operation mode active</b>\n\nDevice: {device}"
+_TPL_STARTUP = "🚀 <b>System Started</b>\n\nVersion: {version}\nMonitoring active"
+_TPL_DATA_STALE = "⚠️ <b>Device Data Stale</b>\n\nDevice: {device}\nNo updates for {minutes} minutes\nCheck device connection"
+_TPL_CONNECTION = "⚠️ <b>Connection Issue</b>\n\nService: {service}\nError: {error}"
+
+
+def _bool(name: str, default: str) -> bool:
+    """Read a "true"/"false" environment flag"""
+    return os.getenv(name, default).lower() == "true"
+
+
+@dataclass(frozen=True, slots=True)
+class NotifierConfig:
+    """Notification settings, parsed once from the environment"""
+    pushover_enabled: bool
+    pushover_user: str
+    pushover_token: str
+    telegram_enabled: bool
+    telegram_token: str
+    telegram_chat_id: str
+    notify_grid_loss: bool
+    notify_soc_warnings: bool
+    notify_shutdown: bool
+    notify_grid_restored: bool
+    notify_system: bool
+    
+    @classmethod
+    def from_env(cls) -> "NotifierConfig":
+        """Build the configuration from the current environment"""
+        return cls(
+            pushover_enabled=_bool("PUSHOVER_ENABLED", "false"),
+            pushover_user=os.getenv("PUSHOVER_USER_KEY", ""),
+            pushover_token=os.getenv("PUSHOVER_API_TOKEN", ""),
+            telegram_enabled=_bool("TELEGRAM_ENABLED", "false"),
+            telegram_token=os.getenv("TELEGRAM_BOT_TOKEN", ""),
+            telegram_chat_id=os.getenv("TELEGRAM_CHAT_ID", ""),
+            notify_grid_loss=_bool("NOTIFY_GRID_LOSS", "true"),
+            notify_soc_warnings=_bool("NOTIFY_SOC_WARNINGS", "true"),
+            notify_shutdown=_bool("NOTIFY_SHUTDOWN_COMMANDS", "true"),
+            notify_grid_restored=_bool("NOTIFY_GRID_RESTORED", "true"),
+            notify_system=_bool("NOTIFY_SYSTEM_EVENTS", "true"),
+        )
+
 
 class Notifier:
     """Handles notifications to Pushover and Telegram"""
     
-    def __init__(self):
+    # Pushover is plain text only; compiled once for every send
+    _HTML_TAG_RE = re.compile(r'<[^>]+>')
+    _TG_HEADERS = {"Content-Type": "application/json"}
+    
+    # Only retry posts the server cannot have accepted: failed connects and 429
+    # (rate limited). A 5xx or read timeout may follow a delivered message, and
+    # re-posting would duplicate the alert (including emergency pushes).
+    # Retry-After is ignored so a throttled send can't park a worker for long.
+    _RETRY = Retry(
+        total=2,
+        connect=2,
+        read=0,
+        other=0,
+        status_forcelist=(429,),
+        allowed_methods=frozenset({"POST"}),
+        backoff_factor=0.3,
+        respect_retry_after_header=False,
+        raise_on_status=False,  # hand the last response to the senders' own error handling
+    )
+    
+    # Sends queued or in flight before new notifications are dropped
+    _MAX_PENDING = 256
+    
+    # Minimum seconds between repeats of the same alert for a device
+    _SOC_COOLDOWN = 300
+    _SOC_CRITICAL_COOLDOWN = 60
+    
+    # SOC warning tiers, most urgent first:
+    # (max SOC above threshold, priority, emoji, repeat cooldown)
+    _SOC_LEVELS = (
+        (0, 1, "🚨", _SOC_CRITICAL_COOLDOWN),  # High (critical)
+        (5, 1, "⚠️", _SOC_COOLDOWN),            # High
+        (math.inf, 0, "🔋", _SOC_COOLDOWN),     # Normal
+    )
+    
+    def __init__(self, config: Optional[NotifierConfig] = None):
+        """
+        Args:
+            config: Settings to use; read from the environment when omitted
+        """
+        self.cfg = cfg = config or NotifierConfig.from_env()
+        
         # Pushover configuration
-        self.pushover_enabled = os.getenv("PUSHOVER_ENABLED", "false").lower() == "true"
-        self.pushover_user = os.getenv("PUSHOVER_USER_KEY", "")
-        self.pushover_token = os.getenv("PUSHOVER_API_TOKEN", "")
+        self.pushover_enabled = cfg.pushover_enabled
+        self.pushover_user = cfg.pushover_user
+        self.pushover_token = cfg.pushover_token
         
         # Telegram configuration
-        self.telegram_enabled = os.getenv("TELEGRAM_ENABLED", "false").lower() == "true"
-        self.telegram_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
-        self.telegram_chat_id = os.getenv("TELEGRAM_CHAT_ID", "")
+        self.telegram_enabled = cfg.telegram_enabled
+        self.telegram_token = cfg.telegram_token
+        self.telegram_chat_id = cfg.telegram_chat_id
         
         # Notification preferences
-        self.notify_grid_loss = os.getenv("NOTIFY_GRID_LOSS", "true").lower() == "true"
-        self.notify_soc_warnings = os.getenv("NOTIFY_SOC_WARNINGS", "true").lower() == "true"
-        self.notify_shutdown = os.getenv("NOTIFY_SHUTDOWN_COMMANDS", "true").lower() == "true"
-        self.notify_grid_restored = os.getenv("NOTIFY_GRID_RESTORED", "true").lower() == "true"
-        self.notify_system = os.getenv("NOTIFY_SYSTEM_EVENTS", "true").lower() == "true"
+        self.notify_grid_loss = cfg.notify_grid_loss
+        self.notify_soc_warnings = cfg.notify_soc_warnings
+        self.notify_shutdown = cfg.notify_shutdown
+        self.notify_grid_restored = cfg.notify_grid_restored
+        self.notify_system = cfg.notify_system
         
         # Validate configuration
         if self.pushover_enabled and (not self.pushover_user or not self.pushover_token):
@@ -43,55 +143,135 @@ class Notifier:
             logger.warning("Telegram enabled but credentials missing - disabling")
             self.telegram_enabled = False
         
+        # Telegram request parts that never change: only the text is encoded per send
+        self._tg_url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
+        self._tg_prefix = f'{{"chat_id":{json.dumps(self.telegram_chat_id)},"parse_mode":"HTML","text":'.encode()
+        
+        # Persistent HTTPS connections, one pool per notification host.
+        # Connect failures and rate limiting are retried with backoff.
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=self._RETRY))
+        
+        # Posts run off the caller's thread; one worker per service so they overlap
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="notifier")
+        self._pending = set()  # futures not yet completed, bounded by _MAX_PENDING
+        
+        # (device, event) -> monotonic time the alert was last sent
+        self._last_sent: Dict[Tuple[str, str], float] = {}
+        
         if self.pushover_enabled:
             logger.info("Pushover notifications enabled")
         if self.telegram_enabled:
             logger.info("Telegram notifications enabled")
         
         # Debug: Log notification preferences
-        logger.debug(f"Notification preferences: grid_loss={self.notify_grid_loss}, soc={self.notify_soc_warnings}, shutdown={self.notify_shutdown}, restored={self.notify_grid_restored}, system={self.notify_system}")
+        logger.debug(
+            "Notification preferences: grid_loss=%s, soc=%s, shutdown=%s, restored=%s, system=%s",
+            self.notify_grid_loss, self.notify_soc_warnings, self.notify_shutdown,
+            self.notify_grid_restored, self.notify_system,
+        )
     
-    def send(self, message: str, priority: int = 0, title: Optional[str] = None):
+    def send(self, message: str, priority: int = 0, title: Optional[str] = None) -> List[Future]:
         """
         Send notification to all enabled services.
         
+        Returns immediately; each service is posted from a background worker
+        and its outcome is logged when it completes. If _MAX_PENDING sends
+        are already waiting (e.g. an API is timing out), the message is
+        dropped with a warning instead of growing the backlog.
+        
         Args:
             message: Notification message
             priority: Priority level (0=normal, 1=high, 2=emergency)
             title: Optional title (defaults to "EcoFlow Monitor")
+        
+        Returns:
+            One future per service the message was submitted to
         """
-        logger.info(f"send() called - title='{title}', pushover={self.pushover_enabled}, telegram={self.telegram_enabled}")
+        logger.info("send() called - title='%s', pushover=%s, telegram=%s", title, self.pushover_enabled, self.telegram_enabled)
         
         if not self.pushover_enabled and not self.telegram_enabled:
             logger.warning("send() - No notification services enabled, skipping")
-            return
+            return []
+        
+        if len(self._pending) >= self._MAX_PENDING:
+            logger.warning("Notification backlog full (%d pending), dropping: %s", len(self._pending), title)
+            return []
         
         title = title or "EcoFlow Monitor"
         
+        futures = []
+        
         # Send to Pushover
         if self.pushover_enabled:
-            logger.info(f"Attempting Pushover notification: {title}")
-            try:
-                self._send_pushover(message, priority, title)
-                logger.info(f"✅ Pushover notification sent successfully: {title}")
-            except Exception as e:
-                logger.error(f"❌ Pushover notification failed: {e}", exc_info=True)
+            logger.info("Attempting Pushover notification: %s", title)
+            future = self._executor.submit(self._send_pushover, message, priority, title)
+            future.add_done_callback(partial(self._log_result, "Pushover", title))
+            futures.append(future)
         
         # Send to Telegram
         if self.telegram_enabled:
-            logger.info(f"Attempting Telegram notification: {title}")
-            try:
-                self._send_telegram(message)
-                logger.info(f"✅ Telegram notification sent successfully: {title}")
-            except Exception as e:
-                logger.error(f"❌ Telegram notification failed: {e}", exc_info=True)
+            logger.info("Attempting Telegram notification: %s", title)
+            future = self._executor.submit(self._send_telegram, message)
+            future.add_done_callback(partial(self._log_result, "Telegram", title))
+            futures.append(future)
+        
+        pending = self._pending
+        pending.update(futures)
+        for future in futures:
+            future.add_done_callback(pending.discard)
+        
+        return futures
+    
+    @staticmethod
+    def _log_result(service: str, title: str, future: Future):
+        """Log the outcome of a background send"""
+        error = future.exception()
+        if error is None:
+            logger.info("✅ %s notification sent successfully: %s", service, title)
+        else:
+            logger.error("❌ %s notification failed: %s", service, error, exc_info=error)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for queued and in-flight sends to complete.
+        
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+        
+        Returns:
+            True if nothing is left pending
+        """
+        _, not_done = wait_futures(list(self._pending), timeout=timeout)
+        return not not_done
+    
+    def close(self, wait: bool = False):
+        """
+        Stop accepting notifications and release pooled connections;
+        sends already submitted still finish.
+        
+        Args:
+            wait: Block until in-flight sends have completed
+        """
+        self._executor.shutdown(wait=wait)
+        self._session.close()
+    
+    def _should_send(self, key: Tuple[str, str], cooldown: float) -> bool:
+        """Rate-limit an alert: False if the same key was sent within cooldown seconds"""
+        now = time.monotonic()
+        last = self._last_sent.get(key)
+        if last is not None and now - last < cooldown:
+            logger.info("%s for %s suppressed (sent %.0fs ago)", key[1], key[0], now - last)
+            return False
+        self._last_sent[key] = now
+        return True
     
     def _send_pushover(self, message: str, priority: int, title: str):
         """Send notification via Pushover API"""
         # Strip HTML tags for Pushover (plain text only)
-        plain_message = re.sub(r'<[^>]+>', '', message)
+        plain_message = self._HTML_TAG_RE.sub('', message) if '<' in message else message
         
-        logger.debug(f"Pushover API call - user={self.pushover_user[:8]}***, message_len={len(plain_message)}")
+        logger.debug("Pushover API call - user=%s***, message_len=%d", self.pushover_user[:8], len(plain_message))
         
         data = {
             "token": self.pushover_token,
@@ -106,123 +286,119 @@ class Notifier:
             data["retry"] = 60  # Retry every 60 seconds
             data["expire"] = 3600  # Expire after 1 hour
         
-        response = requests.post(
+        response = self._session.post(
             "https://api.pushover.net/1/messages.json",
             data=data,
             timeout=5
         )
-        logger.debug(f"Pushover response status: {response.status_code}")
+        logger.debug("Pushover response status: %s", response.status_code)
         if response.status_code != 200:
-            logger.error(f"Pushover API error response: {response.text}")
+            logger.error("Pushover API error response: %s", response.text)
         response.raise_for_status()
         result = response.json()
-        logger.debug(f"Pushover result: {result}")
+        logger.debug("Pushover result: %s", result)
         if result.get("status") != 1:
             raise Exception(f"Pushover API error: {result}")
     
     def _send_telegram(self, message: str):
         """Send notification via Telegram Bot API"""
-        response = requests.post(
-            f"https://api.telegram.org/bot{self.telegram_token}/sendMessage",
-            json={
-                "chat_id": self.telegram_chat_id,
-                "text": message,
-                "parse_mode": "HTML"
-            },
+        body = self._tg_prefix + json.dumps(message).encode() + b'}'
+        response = self._session.post(
+            self._tg_url,
+            data=body,
+            headers=self._TG_HEADERS,
             timeout=5
         )
         response.raise_for_status()
-        logger.debug(f"Telegram sent: {message}")
+        logger.debug("Telegram sent: %s", message)
     
     # High-level notification methods
     
     def grid_lost(self, device_name: str):
         """Notify that grid power was lost"""
-        logger.info(f"grid_lost() called for device={device_name}, notify_grid_loss={self.notify_grid_loss}")
+        logger.info("grid_lost() called for device=%s, notify_grid_loss=%s", device_name, self.notify_grid_loss)
         if not self.notify_grid_loss:
-            logger.warning(f"grid_lost() - notifications disabled, skipping")
+            logger.warning("grid_lost() - notifications disabled, skipping")
             return
-        message = f"⚠️ <b>AC Input Lost or battery charge limit exceeded</b>\n\nDevice: {device_name}\nBattery is discharging to loads"
+        message = _TPL_GRID_LOST.format(device=device_name)
         self.send(message, priority=1, title="Possible AC Power Outage")
     
     def soc_warning(self, device_name: str, soc: int, threshold: int):
         """Notify about low battery SOC"""
-        logger.info(f"soc_warning() called for device={device_name}, soc={soc}, notify_soc_warnings={self.notify_soc_warnings}")
+        logger.info("soc_warning() called for device=%s, soc=%s, notify_soc_warnings=%s", device_name, soc, self.notify_soc_warnings)
         if not self.notify_soc_warnings:
-            logger.warning(f"soc_warning() - notifications disabled, skipping")
+            logger.warning("soc_warning() - notifications disabled, skipping")
             return
         
         # Determine urgency
-        if soc <= threshold:
-            priority = 1  # High (critical)
-            emoji = "🚨"
-        elif soc <= threshold + 5:
-            priority = 1  # High
-            emoji = "⚠️"
-        else:
-            priority = 0  # Normal
-            emoji = "🔋"
-        
-        message = (
-            f"{emoji} <b>Battery Low</b>\n\n"
-            f"Device: {device_name}\n"
-            f"Current: {soc}%\n"
-            f"Threshold: {threshold}%"
-        )
+        delta = soc - threshold
+        for limit, priority, emoji, cooldown in self._SOC_LEVELS:
+            if delta <= limit:
+                break
+        
+        # Only an exact repeat of this reading is coalesced: the policy engine
+        # records each 2% step as alerted, so a dropped step would never be resent
+        if not self._should_send((device_name, f"soc:{soc}"), cooldown):
+            return
+        
+        message = _TPL_SOC_WARNING.format(emoji=emoji, device=device_name, soc=soc, threshold=threshold)
         self.send(message, priority=priority, title="Battery Warning")
     
     def shutdown_sent(self, device_name: str, agents: List[str]):
         """Notify that shutdown commands were sent"""
-        logger.info(f"shutdown_sent() called for device={device_name}, agents={agents}, notify_shutdown={self.notify_shutdown}")
+        logger.info("shutdown_sent() called for device=%s, agents=%s, notify_shutdown=%s", device_name, agents, self.notify_shutdown)
         if not self.notify_shutdown:
-            logger.warning(f"shutdown_sent() - notifications disabled, skipping")
+            logger.warning("shutdown_sent() - notifications disabled, skipping")
             return
         
-        agent_list = "\n".join([f"  • {agent}" for agent in agents])
-        message = (
-            f"🛑 <b>Shutdown Initiated</b>\n\n"
-            f"Device: {device_name}\n"
-            f"Agents:\n{agent_list}"
-        )
+        agent_list = "\n".join(f"  • {agent}" for agent in agents)
+        message = _TPL_SHUTDOWN.format(device=device_name, agents=agent_list)
         self.send(message, priority=1, title="Shutdown Command")
     
     def grid_restored(self, device_name: str):
         """Notify that grid power was restored"""
-        logger.info(f"grid_restored() called for device={device_name}, notify_grid_restored={self.notify_grid_restored}")
+        logger.info("grid_restored() called for device=%s, notify_grid_restored=%s", device_name, self.notify_grid_restored)
         if not self.notify_grid_restored:
-            logger.warning(f"grid_restored() - notifications disabled, skipping")
+            logger.warning("grid_restored() - notifications disabled, skipping")
             return
-        message = f"✅ <b>Pass-through operation mode active</b>\n\nDevice: {device_name}"
+        message = _TPL_GRID_RESTORED.format(device=device_name)
         self.send(message, priority=0, title="AC Power Restored")
     
     def system_startup(self, version: str):
         """Notify that the system started"""
-        logger.info(f"system_startup() called for version={version}, notify_system={self.notify_system}")
+        logger.info("system_startup() called for version=%s, notify_system=%s", version, self.notify_system)
         if not self.notify_system:
-            logger.warning(f"system_startup() - notifications disabled, skipping")
+            logger.warning("system_startup() - notifications disabled, skipping")
             return
-        message = f"🚀 <b>System Started</b>\n\nVersion: {version}\nMonitoring active"
+        message = _TPL_STARTUP.format(version=version)
         self.send(message, priority=0, title="System Startup")
     
     def data_stale(self, device_name: str, minutes: int):
         """Notify that device data is stale"""
-        logger.info(f"data_stale() called for device={device_name}, minutes={minutes}, notify_system={self.notify_system}")
+        logger.info("data_stale() called for device=%s, minutes=%s, notify_system=%s", device_name, minutes, self.notify_system)
         if not self.notify_system:
-            logger.warning(f"data_stale() - notifications disabled, skipping")
+            logger.warning("data_stale() - notifications disabled, skipping")
             return
-        message = (
-            f"⚠️ <b>Device Data Stale</b>\n\n"
-            f"Device: {device_name}\n"
-            f"No updates for {minutes} minutes\n"
-            f"Check device connection"
-        )
+        message = _TPL_DATA_STALE.format(device=device_name, minutes=minutes)
         self.send(message, priority=1, title="Data Stale")
     
     def connection_issue(self, service: str, error: str):
         """Notify about connection problems"""
-        logger.info(f"connection_issue() called for service={service}, notify_system={self.notify_system}")
+        logger.info("connection_issue() called for service=%s, notify_system=%s", service, self.notify_system)
         if not self.notify_system:
-            logger.warning(f"connection_issue() - notifications disabled, skipping")
+            logger.warning("connection_issue() - notifications disabled, skipping")
             return
-        message = f"⚠️ <b>Connection Issue</b>\n\nService: {service}\nError: {error}"
+        message = _TPL_CONNECTION.format(service=service, error=error)
         self.send(message, priority=1, title="Connection Problem")
+
+
+def get_notifier() -> Notifier:
+    """Return the process-wide Notifier, creating it on first use"""
+    return _notifier_for_process(os.getpid())
+
+
+@lru_cache(maxsize=1)
+def _notifier_for_process(pid: int) -> Notifier:
+    # Keyed by pid: services are forked from the orchestrator, and a forked
+    # child must not reuse the parent's worker threads or HTTP connections
+    return Notifier()
@@ -0,0 +1,114 @@
+"""
+Protobuf Scan Helpers
+
+Schema-less protobuf walking shared by the reverse-engineering tools in
+tools/ (deep_inspector, diff_hunter, find_tags, proto_scanner):
+- read_varint: bounded varint decoder that signals EOF by return value
+- looks_like_proto: one-varint probe for "is this a nested message?"
+- scan_payload_flat: every varint in the payload and its nested messages
+- drain_batch: take queued MQTT messages in batches off the network thread
+"""
+import queue
+from typing import List, Optional, Tuple
+
+# Protobuf field numbers are at most 29 bits; the probe is stricter (2**20)
+# since real EcoFlow messages never come close.
+MAX_PROBE_FIELD = 1 << 20
+
+VALID_WIRE_TYPES = (0, 1, 2, 5)
+
+# Messages handed to a tool's decoder per drain_batch() call
+BATCH_SIZE = 64
+
+
+def read_varint(buf: bytes, i: int, n: Optional[int] = None) -> Tuple[Optional[int], int]:
+    """
+    Decode a varint starting at buf[i], reading no further than n.
+
+    Returns:
+        (value, next_index), or (None, -1) if the buffer ends mid-varint
+    """
+    if n is None: n = len(buf)
+    # Fast path: single-byte varints (small tags and values) dominate
+    if i < n:
+        b = buf[i]
+        if b < 0x80: return b, i + 1
+    shift = 0
+    val = 0
+    while i < n:
+        b = buf[i]
+        i += 1
+        val |= (b & 0x7F) << shift
+        if not (b & 0x80): return val, i
+        shift += 7
+    return None, -1
+
+
+def looks_like_proto(buf: bytes, start: int, end: int) -> bool:
+    """Cheap probe: does buf[start:end] begin with a plausible field tag?"""
+    tag, i = read_varint(buf, start, end)
+    return i > 0 and (tag & 0x7) in VALID_WIRE_TYPES and 0 < (tag >> 3) < MAX_PROBE_FIELD
+
+
+def scan_payload_flat(payload: bytes) -> List[Tuple[int, int, int]]:
+    """
+    Collect every varint field in the payload and its nested messages.
+
+    Length-delimited fields are descended into when looks_like_proto()
+    accepts them. Truncated or malformed tails end the current message.
+
+    Returns:
+        (depth, field, value) tuples in depth-first wire order
+    """
+    found = []
+    append = found.append
+    n = len(payload)
+
+    # Iterative depth-first walk over the original buffer. Frame: (offset, end, depth)
+    stack = [(0, n, 0)]
+    while stack:
+        i, end, depth = stack.pop()
+        while i < end:
+            tag, i = read_varint(payload, i, end)
+            if i < 0: break
+            field = tag >> 3
+            wtype = tag & 0x7
+
+            if wtype == 0:  # Varint
+                val, i = read_varint(payload, i, end)
+                if i < 0: break
+                append((depth, field, val))
+            elif wtype == 2:  # Length Delimited
+                ln, i = read_varint(payload, i, end)
+                if i < 0: break
+                sub_end = min(i + ln, end)
+                if ln > 0 and looks_like_proto(payload, i, sub_end):
+                    # Resume this message once the nested one is done
+                    stack.append((i + ln, end, depth))
+                    stack.append((i, sub_end, depth + 1))
+                    break
+                i += ln
+            elif wtype == 1:  # 64-bit
+                i += 8
+            elif wtype == 5:  # 32-bit
+                i += 4
+            else:
+                break
+    return found
+
+
+def drain_batch(inbox: queue.SimpleQueue, batch_size: int = BATCH_SIZE) -> List[Tuple[str, bytes]]:
+    """
+    Block for one (topic, payload) item, then take up to batch_size without waiting.
+
+    The tools' on_message callbacks only put raw payloads on inbox; the main
+    thread decodes them in batches so the MQTT loop never waits on a scanner.
+    """
+    batch = [inbox.get()]
+    get_nowait = inbox.get_nowait
+    try:
+        while len(batch) < batch_size:
+            batch.append(get_nowait())
+    except queue.Empty:
+        pass
+    return batch
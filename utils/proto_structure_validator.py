@@ -14,6 +14,7 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.lib.ecoflow_river3plus import EcoFlowDevice
+from utils.proto_scan import read_varint
 
 def test_varint_encoding():
     """Test varint encoding/decoding"""
@@ -32,20 +33,10 @@ def test_varint_encoding():
         result.append(value & 0x7F)
         return bytes(result)
     
-    def decode_varint(data):
-        """Decode protobuf varint"""
-        result = 0
-        shift = 0
-        for i, byte in enumerate(data):
-            result |= (byte & 0x7F) << shift
-            if not (byte & 0x80):
-                return result, i + 1
-            shift += 7
-        raise ValueError("Truncated varint")
-    
     for val in test_values:
         encoded = encode_varint(val)
-        decoded, bytes_consumed = decode_varint(encoded)
+        # Round-trip through the decoder the scanning tools actually use
+        decoded, bytes_consumed = read_varint(encoded, 0)
         status = "✓" if decoded == val else "✗"
         print(f"{status} Value {val:6d}: encoded={encoded.hex():12s} decoded={decoded:6d} (consumed {bytes_consumed} bytes)")
 
@@ -85,8 +76,7 @@ def test_message_parsing_simple():
     test_message = bytes([0x30, 0x5A])  # Tag 6, value 90
     print(f"Test message: {test_message.hex()} (field 6 = 90)")
     
-    device = EcoFlowDevice("TEST")
-    messages = device._parse_proto_structure(test_message)
+    messages = EcoFlowDevice._parse_proto_structure(test_message)
     
     print(f"Parsed messages: {messages}")
     
@@ -112,8 +102,7 @@ def test_nested_message_parsing():
     print(f"  - Field 1 (length-delimited)")
     print(f"  - Inner: {inner.hex()} (field 6 = 90)")
     
-    device = EcoFlowDevice("TEST")
-    messages = device._parse_proto_structure(outer)
+    messages = EcoFlowDevice._parse_proto_structure(outer)
     
     print(f"\nParsed messages: {messages}")
     
@@ -142,8 +131,7 @@ def test_multiple_fields():
     
     print(f"Test message: {message.hex()}")
     
-    device = EcoFlowDevice("TEST")
-    messages = device._parse_proto_structure(message)
+    messages = EcoFlowDevice._parse_proto_structure(message)
     
     print(f"Parsed messages: {messages}")
     
@@ -181,8 +169,7 @@ def test_real_world_scenario():
     print(f"  Inner2: field 6 = 16")
     print(f"  Raw hex: {message.hex()}")
     
-    device = EcoFlowDevice("TEST")
-    messages = device._parse_proto_structure(message)
+    messages = EcoFlowDevice._parse_proto_structure(message)
     
     print(f"\nParsed messages: {messages}")
     print(f"Number of messages extracted: {len(messages)}")
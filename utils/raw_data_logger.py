@@ -8,19 +8,35 @@ Captures raw protobuf messages and logs both:
 3. All tag 6 occurrences (SOC candidates)
 
 This helps identify parsing issues by correlating anomalous SOC values
-with their raw byte representation.
+with their raw byte representation. Empty and repeated payloads, and
+messages with neither a tag 6 field nor valid decoded data, are only
+counted.
 """
 
 import os
 import sys
 import json
+import atexit
+import queue
+import threading
 import time
 import logging
+from array import array
+from collections import Counter
 from datetime import datetime
 import paho.mqtt.client as mqtt
 
+# orjson is optional; it serializes log entries several times faster
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.lib.ecoflow_river3plus import EcoFlowDevice
+from utils.proto_scan import read_varint as _read_varint
 
 logging.basicConfig(
     level=logging.INFO,
@@ -37,6 +53,33 @@ LOG_DIR = os.getenv("LOG_DIR", "/tmp/ecoflow_raw_logs")
 # Create log directory
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Log lines are buffered and flushed to disk every FLUSH_EVERY messages
+FLUSH_EVERY = 64
+
+# Empty, repeated, or uninteresting messages are not logged; report them in rollups
+SKIP_ROLLUP_EVERY = 1000
+
+class Tag6Hits:
+    """Tag 6 varints found in one payload, stored column-wise"""
+    
+    __slots__ = ("offsets", "values", "ends")
+    
+    def __init__(self):
+        self.offsets = array('Q')  # start of the tag byte
+        self.values = array('Q')   # decoded value (truncated to 64 bits like protobuf)
+        self.ends = array('Q')     # end of the value; payload[offset:end] is the raw field
+    
+    def __len__(self) -> int:
+        return len(self.offsets)
+    
+    def to_dict(self) -> dict:
+        return {
+            "offsets": self.offsets.tolist(),
+            "values": self.values.tolist(),
+            "ends": self.ends.tolist(),
+        }
+
+
 class RawMessageLogger:
     """Logs raw protobuf messages with detailed analysis"""
     
@@ -46,98 +89,110 @@ class RawMessageLogger:
         self.message_count = 0
         self.log_file = os.path.join(LOG_DIR, f"{serial_number}_{int(time.time())}.jsonl")
         logger.info(f"[{self.sn}] Logging to: {self.log_file}")
+        
+        # One handle for the logger's lifetime; shutdown() (or atexit) closes it to flush the tail
+        self._fh = open(self.log_file, 'ab', buffering=1 << 16)
+        self._since_flush = 0
+        self._skipped = Counter()  # reason -> messages not logged
+        self._last_payload = b""
+        atexit.register(self.close)
     
-    def parse_all_tag6_values(self, payload: bytes) -> list:
+    def close(self):
+        """Flush buffered entries and close the log file (safe to call twice)"""
+        self._fh.close()
+    
+    def parse_all_tag6_values(self, payload: bytes) -> Tag6Hits:
         """Find ALL occurrences of tag 6 (SOC) in the payload"""
-        tag6_values = []
+        hits = Tag6Hits()
+        add_offset = hits.offsets.append
+        add_value = hits.values.append
+        add_end = hits.ends.append
+        read_varint = _read_varint
+        n = len(payload)
         
         i = 0
-        while i < len(payload):
-            try:
-                # Read tag
-                tag_val = 0
-                shift = 0
-                tag_start = i
-                
-                while True:
-                    if i >= len(payload):
-                        break
-                    b = payload[i]
+        while i < n:
+            # Read tag (inline fast path: tags for fields 1-15 are one byte)
+            tag_start = i
+            tag_val = payload[i]
+            if tag_val < 0x80:
+                i += 1
+            else:
+                tag_val, i = read_varint(payload, i, n)
+                if i < 0:
+                    break
+            
+            field = tag_val >> 3
+            wtype = tag_val & 0x7
+            
+            # Read value based on wire type
+            if wtype == 0:  # Varint
+                if i < n and payload[i] < 0x80:
+                    val = payload[i]
                     i += 1
-                    tag_val |= (b & 0x7F) << shift
-                    if not (b & 0x80):
+                else:
+                    val, i = read_varint(payload, i, n)
+                    if i < 0:
                         break
-                    shift += 7
-                
-                field = tag_val >> 3
-                wtype = tag_val & 0x7
-                
-                # Read value based on wire type
-                if wtype == 0:  # Varint
-                    val = 0
-                    shift = 0
-                    val_start = i
-                    
-                    while True:
-                        if i >= len(payload):
-                            break
-                        b = payload[i]
-                        i += 1
-                        val |= (b & 0x7F) << shift
-                        if not (b & 0x80):
-                            break
-                        shift += 7
-                    
-                    # Check if this is tag 6
-                    if field == 6:
-                        tag6_values.append({
-                            "offset": tag_start,
-                            "tag": tag_val,
-                            "field": field,
-                            "value": val,
-                            "bytes": payload[tag_start:i].hex()
-                        })
-                
-                elif wtype == 2:  # Length-delimited
-                    length = 0
-                    shift = 0
-                    while True:
-                        if i >= len(payload):
-                            break
-                        b = payload[i]
-                        i += 1
-                        length |= (b & 0x7F) << shift
-                        if not (b & 0x80):
-                            break
-                        shift += 7
-                    
-                    # Skip the data
-                    i += length
                 
-                elif wtype == 1:  # 64-bit
-                    i += 8
-                elif wtype == 5:  # 32-bit
-                    i += 4
-                else:
-                    # Unknown wire type, stop parsing
+                # Check if this is tag 6
+                if field == 6:
+                    add_offset(tag_start)
+                    add_value(val & 0xFFFFFFFFFFFFFFFF)
+                    add_end(i)
+            
+            elif wtype == 2:  # Length-delimited
+                length, i = read_varint(payload, i, n)
+                if i < 0:
                     break
-                    
-            except:
+                # Skip the data
+                i += length
+            
+            elif wtype == 1:  # 64-bit
+                i += 8
+            elif wtype == 5:  # 32-bit
+                i += 4
+            else:
+                # Unknown wire type, stop parsing
                 break
         
-        return tag6_values
+        return hits
+    
+    def _skip(self, reason: str):
+        """Count a message that is not logged, with a periodic rollup"""
+        skipped = self._skipped
+        skipped[reason] += 1
+        total = skipped.total()
+        if total % SKIP_ROLLUP_EVERY == 0:
+            logger.info("[%s] Skipped %d messages: %s", self.sn, total, dict(skipped))
     
     def log_message(self, payload: bytes):
         """Log a single message with full analysis"""
         self.message_count += 1
+        
+        # Keepalives and back-to-back repeats carry nothing new
+        if not payload:
+            self._skip("empty")
+            return
+        if payload == self._last_payload:
+            self._skip("duplicate")
+            return
+        self._last_payload = payload
+        
         timestamp = time.time()
         
+        # Find all tag 6 values
+        all_tag6 = self.parse_all_tag6_values(payload)
+        
         # Decode using the device library
         valid_data = self.device.update_from_protobuf(payload)
-        device_state = self.device.to_json()
         
-        # Find all tag 6 values
-        all_tag6 = self.parse_all_tag6_values(payload)
+        # Nothing to correlate: skip the state dump and the log line
+        if not all_tag6 and not valid_data:
+            self._skip("no_data")
+            return
+        
+        device_state = self.device.to_json()
         
         # Create log entry
         log_entry = {
@@ -149,56 +204,79 @@ class RawMessageLogger:
             "raw_length": len(payload),
             "decoded_state": device_state,
             "valid_data": valid_data,
-            "all_tag6_occurrences": all_tag6,
+            "all_tag6_occurrences": all_tag6.to_dict(),
             "tag6_count": len(all_tag6)
         }
         
         # Write to JSONL file
-        with open(self.log_file, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        self._fh.write(_dumps(log_entry) + b'\n')
+        self._since_flush += 1
+        if self._since_flush >= FLUSH_EVERY:
+            self._fh.flush()
+            self._since_flush = 0
         
         # Log to console if SOC changed or multiple tag 6 values found
         if len(all_tag6) > 0:
-            soc_values = [t["value"] for t in all_tag6]
+            soc_values = all_tag6.values.tolist()
             logger.info(
-                f"[{self.sn}] MSG #{self.message_count}: "
-                f"SOC={device_state.get('soc')}% | "
-                f"Tag6 values: {soc_values} | "
-                f"Hex length: {len(payload)} bytes"
+                "[%s] MSG #%d: SOC=%s%% | Tag6 values: %s | Hex length: %d bytes",
+                self.sn, self.message_count, device_state.get('soc'), soc_values, len(payload)
             )
             
             # Warn if multiple different tag 6 values found
             if len(set(soc_values)) > 1:
                 logger.warning(
-                    f"[{self.sn}] ⚠️  MULTIPLE DIFFERENT TAG 6 VALUES: {soc_values}"
+                    "[%s] ⚠️  MULTIPLE DIFFERENT TAG 6 VALUES: %s", self.sn, soc_values
                 )
 
-# --- MQTT Handlers ---
+# --- Message Queue ---
+# on_message runs on the MQTT network thread; decoding and file writes happen
+# on a worker so bursts queue up instead of stalling the client.
+QUEUE_SIZE = 10_000
+inbox = queue.Queue(maxsize=QUEUE_SIZE)  # (serial number, payload)
+_STOP = None  # sentinel: the worker exits after draining everything queued before it
+dropped = 0
+
 loggers = {}
 
+def worker():
+    """Drain the inbox into per-device loggers"""
+    while True:
+        item = inbox.get()
+        if item is _STOP:
+            return
+        sn, payload = item
+        try:
+            # Create logger for new device
+            if sn not in loggers:
+                logger.info(f"Discovered device: {sn}")
+                loggers[sn] = RawMessageLogger(sn)
+            
+            # Log the message
+            loggers[sn].log_message(payload)
+        
+        except Exception as e:
+            logger.error(f"Error processing message: {e}", exc_info=True)
+
+# --- MQTT Handlers ---
+
 def on_connect(client, userdata, flags, rc, props=None):
     logger.info("Connected to Local MQTT")
     client.subscribe(f"{ECOFLOW_BASE}/+/data")
     logger.info(f"Subscribed to: {ECOFLOW_BASE}/+/data")
 
 def on_message(client, userdata, msg):
+    global dropped
+    # Extract serial number from topic
+    parts = msg.topic.split("/")
+    if len(parts) < 3:
+        return
     try:
-        # Extract serial number from topic
-        parts = msg.topic.split("/")
-        if len(parts) < 3:
-            return
-        sn = parts[1]
-        
-        # Create logger for new device
-        if sn not in loggers:
-            logger.info(f"Discovered device: {sn}")
-            loggers[sn] = RawMessageLogger(sn)
-        
-        # Log the message
-        loggers[sn].log_message(msg.payload)
-        
-    except Exception as e:
-        logger.error(f"Error processing message: {e}", exc_info=True)
+        inbox.put_nowait((parts[1], msg.payload))
+    except queue.Full:
+        dropped += 1
+        if dropped % 1000 == 1:
+            logger.warning("Worker falling behind, dropped %d messages so far", dropped)
 
 def main():
     """Main entry point"""
@@ -214,6 +292,9 @@ def main():
     client.on_connect = on_connect
     client.on_message = on_message
     
+    consumer = threading.Thread(target=worker, name="raw-logger-worker", daemon=True)
+    consumer.start()
+    
     try:
         client.connect(MQTT_HOST, MQTT_PORT, 60)
         logger.info("Starting MQTT loop...")
@@ -222,6 +303,17 @@ def main():
         logger.info("\nStopping logger...")
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
+    finally:
+        shutdown(consumer)
+
+
+def shutdown(consumer: threading.Thread):
+    """Write out everything still queued, then close the log files"""
+    logger.info("Draining %d queued messages...", inbox.qsize())
+    inbox.put(_STOP)  # blocks only while the worker frees space
+    consumer.join()
+    for device_logger in loggers.values():
+        device_logger.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,159 @@
+"""
+Running Median
+
+Median of the most recent k readings, updated one value at a time:
+- k == 5 (the SOC filter default): fixed compare network, no sort
+- k > 5: max-heap/min-heap pair, O(log k) per reading
+- smaller windows, or a window still filling: sort the few values held
+- a window holding a single repeated value short-circuits to that value
+"""
+from collections import Counter, deque
+from heapq import heappop, heappush
+from typing import Iterable, List
+
+
+def _median5(a: float, b: float, c: float, d: float, e: float) -> float:
+    """Median of five values with a fixed compare/swap network (no sort)"""
+    if a > b: a, b = b, a
+    if d > e: d, e = e, d
+    # Drop the smaller of the two pair minimums: it is below at least 3 values
+    if a > d:
+        a, d = d, a
+        b, e = e, b
+    # Median of five is the 2nd smallest of the remaining (b, c, d, e)
+    if c > b:
+        b, c = c, b
+    # Now c <= b and d <= e; the median is the larger of (c, d) capped by the smaller of (b, e)
+    if d > c:
+        return min(d, b)
+    return min(c, e)
+
+
+class _HeapMedian:
+    """
+    Sliding-window median over a bounded deque using a max-heap/min-heap pair.
+
+    Each push is O(log k) instead of an O(k log k) sort. Evicted values are
+    removed lazily: they are counted in _delayed and discarded once they
+    reach the top of their heap, with a rebuild from the window whenever the
+    stale entries outnumber the live ones (e.g. a steady charge buries old
+    values at the bottom of the lower heap).
+    """
+
+    __slots__ = ("window", "_lo", "_hi", "_lo_size", "_hi_size", "_delayed")
+
+    def __init__(self, window: deque):
+        self.window = window
+        self._lo = []  # max-heap of the lower half (values negated)
+        self._hi = []  # min-heap of the upper half
+        self._lo_size = 0  # live entries per heap
+        self._hi_size = 0
+        self._delayed = Counter()
+
+    def push(self, value: float) -> float:
+        """Add a reading (evicting the oldest when full) and return the median"""
+        window = self.window
+        lo, hi = self._lo, self._hi
+
+        evicted = window[0] if len(window) == window.maxlen else None
+        window.append(value)
+
+        if not lo or value <= -lo[0]:
+            heappush(lo, -value)
+            self._lo_size += 1
+        else:
+            heappush(hi, value)
+            self._hi_size += 1
+
+        if evicted is not None:
+            # Heap tops are always live, so this tells us which half holds it
+            self._delayed[evicted] += 1
+            if evicted <= -lo[0]:
+                self._lo_size -= 1
+                self._prune(lo, -1)
+            else:
+                self._hi_size -= 1
+                self._prune(hi, 1)
+
+        # Rebalance so the lower half holds the extra element
+        while self._lo_size > self._hi_size + 1:
+            heappush(hi, -heappop(lo))
+            self._lo_size -= 1
+            self._hi_size += 1
+            self._prune(lo, -1)
+        while self._lo_size < self._hi_size:
+            heappush(lo, -heappop(hi))
+            self._hi_size -= 1
+            self._lo_size += 1
+            self._prune(hi, 1)
+
+        if len(lo) + len(hi) > 2 * window.maxlen:
+            self._rebuild()
+            lo, hi = self._lo, self._hi
+
+        if self._lo_size > self._hi_size:
+            return -lo[0]
+        return (-lo[0] + hi[0]) / 2
+
+    def _rebuild(self):
+        """Recreate both heaps from the live window, dropping stale entries"""
+        ordered = sorted(self.window)
+        split = (len(ordered) + 1) // 2
+        self._lo = [-v for v in reversed(ordered[:split])]  # descending = valid max-heap
+        self._hi = ordered[split:]  # ascending = valid min-heap
+        self._lo_size = split
+        self._hi_size = len(ordered) - split
+        self._delayed.clear()
+
+    def _prune(self, heap: list, sign: int):
+        """Drop evicted values sitting on top of a heap"""
+        delayed = self._delayed
+        while heap:
+            top = sign * heap[0]
+            if not delayed[top]:
+                break
+            delayed[top] -= 1
+            heappop(heap)
+
+
+class RunningMedian:
+    """Median of the last k values pushed"""
+
+    __slots__ = ("window", "_heaps", "_run")
+
+    def __init__(self, k: int):
+        self.window = deque(maxlen=k)
+        self._run = 0  # trailing pushes equal to the newest value
+        # Heap-pair median only pays off above the five-value compare network
+        self._heaps = _HeapMedian(self.window) if k > 5 else None
+
+    def push(self, value: float) -> float:
+        """Add a reading (evicting the oldest when full) and return the median"""
+        if self._heaps is not None:
+            return self._heaps.push(value)
+
+        window = self.window
+        if window and value == window[-1]:
+            self._run += 1
+        else:
+            self._run = 1
+        window.append(value)  # deque maxlen drops the oldest reading
+
+        # Steady state: the whole window holds one value, which is the median
+        if self._run >= len(window):
+            return value
+
+        if len(window) == 5:
+            return _median5(*window)
+
+        # Window still filling: sort it
+        ordered = sorted(window)
+        mid = len(ordered) // 2
+        if len(ordered) % 2:
+            return ordered[mid]
+        return (ordered[mid - 1] + ordered[mid]) / 2
+
+    def push_batch(self, values: Iterable[float]) -> List[float]:
+        """Push each value in order and return the median after each one"""
+        push = self.push
+        return [push(value) for value in values]
@@ -15,6 +15,32 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.lib.ecoflow_river3plus import EcoFlowDevice
 
+
+def _encode_varint(value: int) -> bytes:
+    """Encode value as protobuf varint"""
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+# Encoded varints for every value the demos use (SOC 0-100, temps in centidegrees)
+_VARINT_LUT = tuple(_encode_varint(v) for v in range(4097))
+
+# Field 16 (temperature), wire type 0: tag 128 is itself a two-byte varint
+_TEMP_TAG = _encode_varint((16 << 3) | 0)
+
+
+def _bms_message(soc: int, temp) -> bytes:
+    """Battery module message: field 6 (SOC) and, if given, field 16 (temp)"""
+    buf = bytearray((0x30, soc))
+    if temp is not None:
+        buf += _TEMP_TAG
+        buf += _VARINT_LUT[temp]
+    return bytes(buf)
+
 def demonstrate_fix():
     """Demonstrate the BMS validation fix"""
     
@@ -33,26 +59,9 @@ def demonstrate_fix():
     print("   Module 1: SOC=90%, Temp=25°C  ✓ Valid")
     print("   Module 2: SOC=16%, Temp=None  ✗ Ghost/Invalid")
     
-    # Create test messages
-    def create_message(soc, temp):
-        parts = []
-        # Field 6 (SOC)
-        parts.extend([0x30, soc])
-        # Field 16 (Temp) - only if provided
-        if temp is not None:
-            tag = (16 << 3) | 0
-            parts.append(tag)
-            # Encode varint
-            val = temp
-            while val > 0x7F:
-                parts.append((val & 0x7F) | 0x80)
-                val >>= 7
-            parts.append(val & 0x7F)
-        return bytes(parts)
-    
     # Wrap in nested structure
-    msg1 = create_message(90, 2500)  # Valid
-    msg2 = create_message(16, None)   # Invalid - no temp
+    msg1 = _bms_message(90, 2500)  # Valid
+    msg2 = _bms_message(16, None)   # Invalid - no temp
     
     # Create multi-message payload
     payload_parts = []
@@ -117,17 +126,7 @@ def test_old_behavior_scenario():
     
     for soc, temp, description in test_cases:
         # Create simple message
-        parts = [0x30, soc]  # Field 6
-        if temp is not None:
-            parts.extend([0x80, 0x01])  # Field 16 tag
-            # Encode temp varint
-            val = temp
-            while val > 0x7F:
-                parts.append((val & 0x7F) | 0x80)
-                val >>= 7
-            parts.append(val & 0x7F)
-        
-        payload = bytes(parts)
+        payload = _bms_message(soc, temp)
         prev_soc = device.soc
         device.update_from_protobuf(payload)
         
@@ -7,9 +7,10 @@ Filters erroneous SOC readings using multi-tier validation:
 3. Median filter (smooth out noise)
 """
 import time
-import statistics
 import logging
-from typing import Optional
+from typing import Iterable, List, Optional
+
+from utils.running_median import RunningMedian
 
 logger = logging.getLogger("soc_filter")
 
@@ -17,6 +18,23 @@ logger = logging.getLogger("soc_filter")
 class SOCFilter:
     """Filter anomalous SOC readings using multi-tier validation"""
     
+    # Fixed attribute layout: one filter per device, consulted on every message
+    __slots__ = (
+        "device_name",
+        "max_change_per_minute",
+        "confirmation_threshold",
+        "required_confirmations",
+        "pending_soc",
+        "confirmation_count",
+        "confirmed_soc",
+        "window_size",
+        "recent_readings",
+        "_median",
+        "last_valid_soc",
+        "last_valid_time",
+        "last_gap_reset",
+    )
+    
     def __init__(self, device_name: str):
         self.device_name = device_name
         
@@ -32,7 +50,8 @@ class SOCFilter:
         
         # Tier 3: Median filter
         self.window_size = 5
-        self.recent_readings = []
+        self._median = RunningMedian(self.window_size)
+        self.recent_readings = self._median.window
         
         # Tracking
         self.last_valid_soc = None
@@ -45,17 +64,18 @@ class SOCFilter:
         
         Args:
             raw_soc: Raw SOC value from device (0-100)
-            timestamp: Unix timestamp (defaults to current time)
+            timestamp: Time in seconds; only differences are used, so any
+                monotonic clock works (defaults to time.monotonic())
         
         Returns:
             Filtered SOC value, or None if rejected
         """
         if timestamp is None:
-            timestamp = time.time()
+            timestamp = time.monotonic()
         
         # First reading - accept and initialize
         if self.last_valid_soc is None:
-            logger.info(f"[{self.device_name}] SOC Filter initialized: {raw_soc}%")
+            logger.info("[%s] SOC Filter initialized: %s%%", self.device_name, raw_soc)
             self._accept_reading(raw_soc, timestamp)
             return raw_soc
         
@@ -63,50 +83,71 @@ class SOCFilter:
         time_delta = timestamp - self.last_valid_time
         if time_delta > 300:  # 5 minutes
             logger.info(
-                f"[{self.device_name}] Large time gap detected ({time_delta:.0f}s), "
-                f"resetting confirmation window"
+                "[%s] Large time gap detected (%.0fs), resetting confirmation window",
+                self.device_name, time_delta
             )
             self._reset_confirmation()
             self.last_gap_reset = timestamp
         
-        # Tier 1: Plausibility check
-        if not self._is_plausible(raw_soc, timestamp):
-            logger.warning(
-                f"[{self.device_name}] REJECTED: Implausible SOC change "
-                f"{self.last_valid_soc:.1f}% → {raw_soc:.1f}% in {time_delta:.1f}s "
-                f"({self._calculate_change_rate(raw_soc, timestamp):.1f}%/min, "
-                f"max: {self.max_change_per_minute}%/min)"
-            )
-            return None  # Reject this reading
-        
-        # Tier 2: Confirmation window
-        confirmed = self._check_confirmation(raw_soc)
-        if not confirmed:
-            logger.info(
-                f"[{self.device_name}] PENDING: SOC {raw_soc:.1f}% awaiting confirmation "
-                f"({self.confirmation_count}/{self.required_confirmations})"
-            )
-            return self.confirmed_soc  # Return last confirmed value
+        # Steady-state fast path: a step within 3% is always plausible, and one
+        # that stays near the confirmed value is confirmed at once. Same outcome
+        # as tiers 1-2 below, without the helper calls.
+        delta = raw_soc - self.last_valid_soc
+        if -3.0 <= delta <= 3.0 and abs(raw_soc - self.confirmed_soc) <= self.confirmation_threshold:
+            self.pending_soc = None
+            self.confirmation_count = 0
+            self.confirmed_soc = raw_soc
+        else:
+            # Tier 1: Plausibility check (only called once last_valid_soc is set)
+            if not self._is_plausible(raw_soc, timestamp):
+                logger.warning(
+                    "[%s] REJECTED: Implausible SOC change %.1f%% → %.1f%% in %.1fs "
+                    "(%.1f%%/min, max: %s%%/min)",
+                    self.device_name, self.last_valid_soc, raw_soc, time_delta,
+                    self._calculate_change_rate(raw_soc, timestamp), self.max_change_per_minute
+                )
+                return None  # Reject this reading
+            
+            # Tier 2: Confirmation window
+            confirmed = self._check_confirmation(raw_soc)
+            if not confirmed:
+                logger.info(
+                    "[%s] PENDING: SOC %.1f%% awaiting confirmation (%d/%d)",
+                    self.device_name, raw_soc, self.confirmation_count, self.required_confirmations
+                )
+                return self.confirmed_soc  # Return last confirmed value
         
         # Tier 3: Median filter
         filtered_soc = self._apply_median_filter(raw_soc)
         
-        logger.debug(
-            f"[{self.device_name}] FILTERED: raw={raw_soc:.1f}%, "
-            f"window={[round(r, 1) for r in self.recent_readings]}, "
-            f"median={filtered_soc:.1f}%"
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[%s] FILTERED: raw=%.1f%%, window=%s, median=%.1f%%",
+                self.device_name, raw_soc, [round(r, 1) for r in self.recent_readings], filtered_soc
+            )
         
-        # Update tracking
-        self._accept_reading(filtered_soc, timestamp)
+        # Update tracking (_accept_reading inlined: confirmed_soc is already set)
+        self.last_valid_soc = filtered_soc
+        self.last_valid_time = timestamp
         
         return filtered_soc
     
+    def filter_batch(self, raw_socs: Iterable[float], timestamps: Iterable[float]) -> List[Optional[float]]:
+        """
+        Filter a sequence of SOC readings (e.g. historical replay).
+        
+        Args:
+            raw_socs: Raw SOC values in arrival order
+            timestamps: Times in seconds (same clock as filter()), one per reading
+        
+        Returns:
+            Filtered SOC value per reading (None where rejected)
+        """
+        filter_one = self.filter
+        return [filter_one(soc, ts) for soc, ts in zip(raw_socs, timestamps, strict=True)]
+    
     def _is_plausible(self, new_soc: float, timestamp: float) -> bool:
         """Check if SOC change is physically plausible"""
-        if self.last_valid_soc is None:
-            return True
-        
         # Small changes (<= 3.0%) are always plausible regardless of time
         # This handles rapid toggling between batteries (e.g. 90% -> 89% -> 90%)
         # and normal charging/discharging noise.
@@ -114,8 +155,12 @@ class SOCFilter:
         if soc_delta <= 3.0:
             return True
 
-        change_rate = self._calculate_change_rate(new_soc, timestamp)
-        return change_rate <= self.max_change_per_minute
+        time_delta = timestamp - self.last_valid_time
+        if time_delta <= 0:
+            return True
+        
+        # Same test as _calculate_change_rate() <= max, cross-multiplied to skip the divide
+        return soc_delta * 60 <= self.max_change_per_minute * time_delta
     
     def _calculate_change_rate(self, new_soc: float, timestamp: float) -> float:
         """Calculate SOC change rate in %/minute"""
@@ -142,7 +187,8 @@ class SOCFilter:
         if self.confirmed_soc is not None:
             change = abs(new_soc - self.confirmed_soc)
             if change <= self.confirmation_threshold:
-                self._reset_confirmation()
+                self.pending_soc = None
+                self.confirmation_count = 0
                 self.confirmed_soc = new_soc
                 return True
         
@@ -157,25 +203,18 @@ class SOCFilter:
             self.confirmation_count += 1
             if self.confirmation_count >= self.required_confirmations:
                 logger.info(
-                    f"[{self.device_name}] CONFIRMED: SOC change "
-                    f"{self.confirmed_soc:.1f}% → {new_soc:.1f}% "
-                    f"after {self.confirmation_count} consecutive readings"
+                    "[%s] CONFIRMED: SOC change %.1f%% → %.1f%% after %d consecutive readings",
+                    self.device_name, self.confirmed_soc, new_soc, self.confirmation_count
                 )
                 self.confirmed_soc = new_soc
-                self._reset_confirmation()
+                self.pending_soc = None
+                self.confirmation_count = 0
                 return True
             return False
     
     def _apply_median_filter(self, new_soc: float) -> float:
         """Apply median filter to smooth out noise"""
-        self.recent_readings.append(new_soc)
-        
-        # Keep only last N readings
-        if len(self.recent_readings) > self.window_size:
-            self.recent_readings.pop(0)
-        
-        # Return median
-        return statistics.median(self.recent_readings)
+        return self._median.push(new_soc)
     
     def _accept_reading(self, soc: float, timestamp: float):
         """Accept a reading and update tracking"""
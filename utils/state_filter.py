@@ -7,8 +7,7 @@ accepting a state change.
 """
 import time
 import logging
-from typing import Optional
-from collections import deque
+from typing import Iterable, List, Optional
 
 logger = logging.getLogger("state_filter")
 
@@ -16,6 +15,17 @@ logger = logging.getLogger("state_filter")
 class BooleanStateFilter:
     """Filter transient false readings in boolean state values"""
     
+    # Fixed attribute layout: one filter per device, consulted on every message
+    __slots__ = (
+        "device_name",
+        "state_name",
+        "required_confirmations",
+        "confirmed_state",
+        "last_update_time",
+        "_mask",
+        "_history",
+    )
+    
     def __init__(self, device_name: str, state_name: str = "state", required_confirmations: int = 5):
         """
         Initialize boolean state filter.
@@ -24,6 +34,7 @@ class BooleanStateFilter:
             device_name: Name of device for logging
             state_name: Name of the state being filtered (for logging)
             required_confirmations: Number of consecutive readings required to confirm state change
+                (values below 2 still require two, so one glitch never flips the state)
         """
         self.device_name = device_name
         self.state_name = state_name
@@ -32,102 +43,120 @@ class BooleanStateFilter:
         # Current confirmed state
         self.confirmed_state: Optional[bool] = None
         
-        # Confirmation window
-        self.pending_state: Optional[bool] = None
-        self.confirmation_count = 0
-        
-        # Recent readings for majority voting
-        self.recent_readings = deque(maxlen=required_confirmations)
+        # Confirmation window: one bit per recent reading (newest in bit 0).
+        # A change is confirmed once every bit disagrees with confirmed_state.
+        # At least two bits: a change is never confirmed by a single reading.
+        self._mask = (1 << max(required_confirmations, 2)) - 1
+        self._history = 0
         
         # Tracking
         self.last_update_time: Optional[float] = None
     
+    @property
+    def confirmation_count(self) -> int:
+        """Consecutive readings (newest first) that disagree with the confirmed state"""
+        changed = self._history ^ self._confirmed_bits()
+        # Number of trailing one bits
+        return (~changed & (changed + 1)).bit_length() - 1
+    
+    @property
+    def pending_state(self) -> Optional[bool]:
+        """State awaiting confirmation, or None if the window is clear"""
+        if self.confirmation_count == 0:
+            return None
+        return not self.confirmed_state
+    
     def filter(self, raw_value: bool, timestamp: float = None) -> bool:
         """
         Filter boolean state value through confirmation window.
         
         Args:
             raw_value: Raw boolean value from device
-            timestamp: Unix timestamp (defaults to current time)
+            timestamp: Time in seconds; only differences are used, so any
+                monotonic clock works (defaults to time.monotonic())
         
         Returns:
             Filtered boolean value (confirmed state)
         """
         if timestamp is None:
-            timestamp = time.time()
+            timestamp = time.monotonic()
         
         # First reading - accept and initialize
         if self.confirmed_state is None:
-            logger.info(
-                f"[{self.device_name}] {self.state_name} filter initialized: {raw_value}"
-            )
+            logger.info("[%s] %s filter initialized: %s", self.device_name, self.state_name, raw_value)
             self._accept_reading(raw_value, timestamp)
             return raw_value
         
-        # Add to recent readings
-        self.recent_readings.append(raw_value)
-        
         # Check for large time gap (device was offline)
         if self.last_update_time is not None:
             time_delta = timestamp - self.last_update_time
             if time_delta > 300:  # 5 minutes
                 logger.info(
-                    f"[{self.device_name}] Large time gap detected ({time_delta:.0f}s), "
-                    f"resetting {self.state_name} confirmation window"
+                    "[%s] Large time gap detected (%.0fs), resetting %s confirmation window",
+                    self.device_name, time_delta, self.state_name
                 )
                 self._reset_confirmation()
         
+        # Shift the reading into the history; set bits in `changed` disagree
+        confirmed_bits = self._confirmed_bits()
+        was_pending = (self._history ^ confirmed_bits) & 1
+        self._history = ((self._history << 1) | (1 if raw_value else 0)) & self._mask
+        changed = self._history ^ confirmed_bits
+        
         # Check if state matches confirmed state
-        if raw_value == self.confirmed_state:
-            # State unchanged - reset any pending confirmation
-            if self.pending_state is not None:
+        if not changed & 1:
+            # State unchanged - the pending run (if any) is broken
+            if was_pending:
                 logger.debug(
-                    f"[{self.device_name}] {self.state_name} returned to confirmed state: {raw_value}"
+                    "[%s] %s returned to confirmed state: %s", self.device_name, self.state_name, raw_value
                 )
-                self._reset_confirmation()
             self.last_update_time = timestamp
             return self.confirmed_state
         
-        # State change detected - require confirmation
-        if self.pending_state is None or self.pending_state != raw_value:
-            # New pending state
-            self.pending_state = raw_value
-            self.confirmation_count = 1
-            logger.info(
-                f"[{self.device_name}] PENDING: {self.state_name} change "
-                f"{self.confirmed_state} → {raw_value} awaiting confirmation "
-                f"(1/{self.required_confirmations})"
-            )
-        else:
-            # Same pending state - increment confirmation
-            self.confirmation_count += 1
-            logger.info(
-                f"[{self.device_name}] PENDING: {self.state_name} change "
-                f"{self.confirmed_state} → {raw_value} awaiting confirmation "
-                f"({self.confirmation_count}/{self.required_confirmations})"
+        # Every reading in the window disagrees: state change confirmed
+        if changed == self._mask:
+            logger.warning(
+                "[%s] CONFIRMED: %s change %s → %s after %d consecutive readings",
+                self.device_name, self.state_name, self.confirmed_state, raw_value,
+                self._mask.bit_length()
             )
-            
-            # Check if confirmed
-            if self.confirmation_count >= self.required_confirmations:
-                logger.warning(
-                    f"[{self.device_name}] CONFIRMED: {self.state_name} change "
-                    f"{self.confirmed_state} → {raw_value} "
-                    f"after {self.confirmation_count} consecutive readings"
-                )
-                self._accept_reading(raw_value, timestamp)
-                self._reset_confirmation()
-                return raw_value
+            self._accept_reading(raw_value, timestamp)
+            return raw_value
+        
+        logger.info(
+            "[%s] PENDING: %s change %s → %s awaiting confirmation (%d/%d)",
+            self.device_name, self.state_name, self.confirmed_state, raw_value,
+            self.confirmation_count, self.required_confirmations
+        )
         
         # Not yet confirmed - return current confirmed state
         self.last_update_time = timestamp
         return self.confirmed_state
     
+    def filter_batch(self, raw_values: Iterable[bool], timestamps: Iterable[float]) -> List[bool]:
+        """
+        Filter a sequence of boolean readings (e.g. historical replay).
+        
+        Args:
+            raw_values: Raw boolean values in arrival order
+            timestamps: Times in seconds (same clock as filter()), one per reading
+        
+        Returns:
+            Filtered boolean value per reading
+        """
+        filter_one = self.filter
+        return [filter_one(value, ts) for value, ts in zip(raw_values, timestamps, strict=True)]
+    
+    def _confirmed_bits(self) -> int:
+        """History pattern of a window that fully agrees with the confirmed state"""
+        return self._mask if self.confirmed_state else 0
+    
     def _accept_reading(self, value: bool, timestamp: float):
         """Accept a reading and update confirmed state"""
         self.confirmed_state = value
         self.last_update_time = timestamp
+        self._reset_confirmation()
     
     def _reset_confirmation(self):
         """Reset confirmation window"""
-        self.pending_state = None
-        self.confirmation_count = 0
+        self._history = self._confirmed_bits()